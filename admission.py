@@ -0,0 +1,174 @@
+import asyncio
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+
+class Saturated(Exception):
+    """
+    Raised when a request cannot be admitted; carries the HTTP status and
+    Retry-After hint to send back to the client.
+    """
+
+    def __init__(self, status_code, retry_after, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _ThreadSlot:
+    __slots__ = ("lock", "pending", "lease_token")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Requests holding or waiting for this thread's lock
+        self.pending = 0
+        # Owner token of the cross-process lease held by the running request
+        self.lease_token = None
+
+
+class AdmissionController:
+    """
+    Serializes requests per OpenAI thread and caps the number of assistant
+    runs in flight across all threads, each with a short bounded queue.
+    Must be used from a single event loop.
+
+    With a `lease_backend` (a shared_state.StateBackend) the running request
+    also holds a per-thread lease in it, so workers in other processes
+    don't start a second run on the same OpenAI thread. `lease_ttl` bounds
+    how long a crashed worker's lease blocks the conversation and should
+    exceed the longest assistant turn.
+    """
+
+    LEASE_NAMESPACE = "thread_lock"
+    LEASE_POLL_SECONDS = 0.2
+
+    def __init__(self, max_in_flight=8, max_queue=32, per_thread_queue=1, queue_timeout=15.0, lease_backend=None, lease_ttl=300):
+        self.lease_backend = lease_backend
+        self.lease_ttl = lease_ttl
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.per_thread_queue = per_thread_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._threads = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"thread_busy": 0, "queue_full": 0, "queue_timeout": 0}
+        # Moving average of how long an admitted request holds a slot (seconds)
+        self.avg_service_seconds = 5.0
+
+    @asynccontextmanager
+    async def admit(self, thread_id=None):
+        slot = await self._acquire_thread(thread_id) if thread_id else None
+        try:
+            await self._acquire_global()
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+                elapsed = time.monotonic() - start
+                self.avg_service_seconds = 0.9 * self.avg_service_seconds + 0.1 * elapsed
+        finally:
+            if slot:
+                self._release_thread(thread_id, slot)
+
+    async def _acquire_thread(self, thread_id):
+        slot = self._threads.get(thread_id)
+        if slot is None:
+            slot = self._threads[thread_id] = _ThreadSlot()
+        # One request running plus a short queue behind it
+        if slot.pending > self.per_thread_queue:
+            self.rejected["thread_busy"] += 1
+            raise Saturated(429, self._retry_after(1), "A request for this conversation is already in progress")
+        slot.pending += 1
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            await asyncio.wait_for(slot.lock.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            self._drop_thread_waiter(thread_id, slot)
+            raise Saturated(429, self._retry_after(1), "Timed out waiting for the previous request in this conversation")
+        except BaseException:
+            self._drop_thread_waiter(thread_id, slot)
+            raise
+        if self.lease_backend is not None:
+            try:
+                await self._acquire_lease(thread_id, slot, deadline)
+            except BaseException:
+                slot.lock.release()
+                self._drop_thread_waiter(thread_id, slot)
+                raise
+        return slot
+
+    async def _acquire_lease(self, thread_id, slot, deadline):
+        token = uuid.uuid4().hex
+        while not await asyncio.to_thread(
+            self.lease_backend.add, self.LEASE_NAMESPACE, thread_id, token, ttl=self.lease_ttl
+        ):
+            # Another worker process is running a turn on this thread
+            if time.monotonic() >= deadline:
+                self.rejected["queue_timeout"] += 1
+                raise Saturated(429, self._retry_after(1), "Timed out waiting for the previous request in this conversation")
+            await asyncio.sleep(self.LEASE_POLL_SECONDS)
+        slot.lease_token = token
+
+    def _release_lease(self, thread_id, slot):
+        token, slot.lease_token = slot.lease_token, None
+        try:
+            # Don't drop a lease that expired and was taken over by another worker
+            if self.lease_backend.get(self.LEASE_NAMESPACE, thread_id) == token:
+                self.lease_backend.delete(self.LEASE_NAMESPACE, thread_id)
+        except Exception as e:
+            print(f"⚠️ Failed to release lease for thread {thread_id}; it expires in {self.lease_ttl}s: {e}")
+
+    def _release_thread(self, thread_id, slot):
+        if slot.lease_token:
+            self._release_lease(thread_id, slot)
+        slot.lock.release()
+        self._drop_thread_waiter(thread_id, slot)
+
+    def _drop_thread_waiter(self, thread_id, slot):
+        slot.pending -= 1
+        if slot.pending == 0 and self._threads.get(thread_id) is slot:
+            del self._threads[thread_id]
+
+    async def _acquire_global(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise Saturated(503, self._retry_after(self.waiting), "Assistant is at capacity")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            raise Saturated(503, self._retry_after(self.waiting), "Timed out waiting for assistant capacity")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def _retry_after(self, queued):
+        # Rough time for the requests ahead of us to drain
+        seconds = self.avg_service_seconds * max(queued, 1) / self.max_in_flight
+        return max(1, math.ceil(seconds))
+
+    def stats(self):
+        thread_depths = [slot.pending for slot in self._threads.values()]
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "active_threads": len(thread_depths),
+            "queued_thread_requests": sum(max(depth - 1, 0) for depth in thread_depths),
+            "max_thread_queue_depth": max((depth - 1 for depth in thread_depths), default=0),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_ms": round(1000 * self.avg_service_seconds, 1),
+        }
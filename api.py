@@ -1,9 +1,17 @@
-from fastapi import FastAPI, Header, HTTPException
+import os
+import time
+
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
 
-from main import run_assistant
+import dates
+from admission import AdmissionController, Saturated
+from main import run_assistant, response_cache, intent_router, prefetcher, calendar_prefetcher, booking_jobs, compaction_stats, cart_store, fx_table, state_backend
+from warmup import WarmupService
+from profiling import Profiler
 
 app = FastAPI()
 
@@ -16,11 +24,97 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MAX_IN_FLIGHT_RUNS", 8)),
+    max_queue=int(os.getenv("MAX_QUEUED_RUNS", 32)),
+    per_thread_queue=int(os.getenv("PER_THREAD_QUEUE", 1)),
+    queue_timeout=float(os.getenv("QUEUE_TIMEOUT_SECONDS", 15)),
+    # Serializes turns per threadid across worker processes sharing the backend
+    lease_backend=state_backend,
+    lease_ttl=int(os.getenv("THREAD_LEASE_TTL", 300)),
+)
+
+warmup = WarmupService()
+profiler = Profiler(
+    directory=os.getenv("PROFILE_DIR", ".cache/profiles"),
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)),
+    interval=float(os.getenv("PROFILE_INTERVAL", 0.005)),
+    # X-Profile is ignored unless it matches this token
+    token=os.getenv("PROFILE_TOKEN"),
+    max_concurrent=int(os.getenv("PROFILE_MAX_CONCURRENT", 1)),
+    max_files=int(os.getenv("PROFILE_MAX_FILES", 50)),
+)
+
+
+@app.on_event("startup")
+def warm_caches():
+    # Serve the persisted catalog immediately; upstream refresh runs in the background
+    warmup.start()
+    # Resume booking jobs left pending by a previous process
+    booking_jobs.start()
+
+
+@app.on_event("shutdown")
+def persist_caches():
+    warmup.stop()
+    booking_jobs.stop()
+    prefetcher.shutdown()
+    calendar_prefetcher.shutdown()
+
 class QueryRequest(BaseModel):
     user_input: str
 
 @app.post("/query")
-async def query_endpoint(request: QueryRequest, threadid: Optional[str] = Header(None)):
-    result = run_assistant(request.user_input, thread_id=threadid)
+async def query_endpoint(
+    request: QueryRequest,
+    response: Response,
+    threadid: Optional[str] = Header(None),
+    x_profile: Optional[str] = Header(None),
+):
+    received_at = time.perf_counter()
+    try:
+        async with admission.admit(threadid):
+            # run_assistant blocks on OpenAI polling; keep it off the event loop
+            if profiler.should_profile(x_profile):
+                result, profile_file = await run_in_threadpool(
+                    profiler.run, "query", run_assistant, request.user_input, thread_id=threadid, started_at=received_at
+                )
+                if profile_file:
+                    response.headers["X-Profile-File"] = profile_file
+            else:
+                result = await run_in_threadpool(run_assistant, request.user_input, thread_id=threadid)
+    except Saturated as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)},
+        )
     print(result)
     return result
+
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str, wait: float = 0):
+    # Long-poll up to `wait` seconds for the booking job to finish
+    job = await run_in_threadpool(booking_jobs.wait, job_id, min(max(wait, 0), 30))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return {
+        "admission": admission.stats(),
+        "response_cache": response_cache.stats(),
+        "intent_router": intent_router.stats(),
+        "prefetch": prefetcher.stats(),
+        "calendar_prefetch": calendar_prefetcher.stats(),
+        "warmup": warmup.stats(),
+        "booking_jobs": booking_jobs.stats(),
+        "compaction": compaction_stats.stats(),
+        "cart": cart_store.stats(),
+        "fx": fx_table.stats(),
+        "dates": dates.stats(),
+        "profiling": profiler.stats(),
+    }
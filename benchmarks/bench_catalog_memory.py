@@ -0,0 +1,93 @@
+"""
+Memory held by the property catalog and product feeds as raw dicts versus the
+compact records in catalog_records, measured with tracemalloc on synthetic
+data shaped like the upstream payloads.
+
+    python benchmarks/bench_catalog_memory.py --properties 1000 --products 40
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_records import catalog_from_regions, parse_product_feed  # noqa: E402
+
+REGIONS = ["Asia", "Europe", "North America", "Middle East", "Africa", "Caribbean", "South America", "Oceania"]
+
+
+def regions_payload(properties):
+    regions = [{"title": title, "properties": []} for title in REGIONS]
+    for i in range(properties):
+        regions[i % len(REGIONS)]["properties"].append(
+            {"name": f"Four Seasons Resort Property {i}", "owsCode": f"P{i:04d}", "tripteaseAPIKey": f"key-{i:08x}"}
+        )
+    return {"regions": regions}
+
+
+def feed_payload(owsCode, products):
+    return {
+        "owsCode": owsCode,
+        "products": [
+            {
+                "name": f"Sunset Experience {i}",
+                "shortDescription": "A guided evening on the water with drinks and canapés for two guests.",
+                "detailPageUrl": f"https://www.fourseasons.com/{owsCode.lower()}/experiences/{i}/",
+                "skus": [{"skuId": f"{owsCode}-{i:03d}", "price": {"amount": 120 + i, "currencyCode": "INR"}}],
+                "images": [{"url": f"https://example.com/{owsCode}/{i}.jpg", "alt": "Experience"}],
+            }
+            for i in range(products)
+        ],
+    }
+
+
+def measure(build):
+    """
+    Bytes still allocated after build() returns, i.e. what a cache would hold.
+    """
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--properties", type=int, default=1000)
+    parser.add_argument("--feeds", type=int, default=100, help="number of property feeds to hold")
+    parser.add_argument("--products", type=int, default=40, help="products per feed")
+    args = parser.parse_args()
+
+    catalog_json = json.dumps(regions_payload(args.properties))
+    feed_json = [json.dumps(feed_payload(f"P{i:04d}", args.products)) for i in range(args.feeds)]
+
+    def dict_catalog():
+        data = json.loads(catalog_json)
+        return [
+            {"name": p["name"], "owsCode": p["owsCode"], "tripteaseAPIKey": p.get("tripteaseAPIKey"), "region": r["title"]}
+            for r in data["regions"]
+            for p in r["properties"]
+        ]
+
+    rows = [
+        ("catalog as dicts", *measure(dict_catalog)),
+        ("catalog as PropertyRecord", *measure(lambda: catalog_from_regions(json.loads(catalog_json)))),
+        ("feeds as raw payloads", *measure(lambda: [json.loads(payload) for payload in feed_json])),
+        (
+            "feeds as ProductFeed",
+            *measure(lambda: [parse_product_feed(json.loads(p), f"P{i:04d}", "experiences") for i, p in enumerate(feed_json)]),
+        ),
+    ]
+    print(f"{args.properties} properties, {args.feeds} feeds x {args.products} products\n")
+    for label, _, size in rows:
+        print(f"{label:<28} {size / 1024:>10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Per-turn latency of a long planning conversation, before and after thread
+compaction. Drives a running API (uvicorn api:app) with a scripted
+conversation on one threadid and reads compaction counters from /metrics.
+Start the server with low limits so compaction triggers within the run:
+
+    COMPACT_MAX_MESSAGES=12 uvicorn api:app --port 8100
+    python benchmarks/bench_compaction.py --url http://localhost:8100 --turns 20
+"""
+import time
+import argparse
+
+import requests
+
+CONVERSATION = [
+    "Show me Four Seasons properties in Asia",
+    "Tell me about the Maldives properties",
+    "Check availability at Landaa Giraavaru from Dec 20 to Dec 25 for 2 guests",
+    "Yes, please confirm the booking",
+    "Show me the dining options",
+    "Show me the experiences",
+    "Add the sunset dolphin cruise",
+    "What else would you recommend for a romantic evening?",
+    "Show my cart",
+    "What spa treatments are available?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8100")
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    thread_id = None
+    before, after = [], []
+    print(f"{'turn':>4} {'latency_ms':>10} {'compactions':>11}  message")
+    for turn in range(args.turns):
+        message = CONVERSATION[turn % len(CONVERSATION)]
+        headers = {"threadid": thread_id} if thread_id else {}
+        start = time.perf_counter()
+        response = requests.post(f"{args.url}/query", json={"user_input": message}, headers=headers, timeout=300)
+        latency = time.perf_counter() - start
+        response.raise_for_status()
+        thread_id = thread_id or response.json()["thread_id"]
+        compactions = requests.get(f"{args.url}/metrics", timeout=10).json()["compaction"]["compactions"]
+        (after if compactions else before).append(latency)
+        print(f"{turn + 1:>4} {1000 * latency:>10.0f} {compactions:>11}  {message}")
+
+    def avg_ms(samples):
+        return f"{1000 * sum(samples) / len(samples):.0f} ms" if samples else "n/a"
+
+    print(f"\nthreadid {thread_id} (unchanged for the client throughout)")
+    print(f"average turn before first compaction: {avg_ms(before)} over {len(before)} turns")
+    print(f"average turn after compaction:        {avg_ms(after)} over {len(after)} turns")
+    print(f"server-side: {requests.get(f'{args.url}/metrics', timeout=10).json()['compaction']}")
+
+
+if __name__ == "__main__":
+    main()
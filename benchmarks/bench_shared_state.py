@@ -0,0 +1,99 @@
+"""
+Multi-process throughput of the shared-state backend.
+
+Each worker process simulates /query turns against one SQLiteBackend file:
+read and update a session, read the catalog and two feeds from cache, check
+the response cache, serialize the catalog as a tool output and occasionally
+claim an idempotency key. Reports turns/second as the worker count grows.
+
+    python benchmarks/bench_shared_state.py --workers 1 2 4 8 --seconds 5
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_state import SQLiteBackend, SharedCache  # noqa: E402
+
+PROPERTIES = [
+    {"name": f"Four Seasons Property {i}", "owsCode": f"P{i:04d}", "tripteaseAPIKey": None, "region": f"Region {i % 8}"}
+    for i in range(500)
+]
+FEED = {"products": [{"name": f"Experience {i}", "price": 100 + i, "detailPageUrl": f"https://example.com/{i}"} for i in range(40)]}
+
+
+def seed(path):
+    backend = SQLiteBackend(path)
+    SharedCache(backend, "catalog", 3600).set("properties", PROPERTIES)
+    feeds = SharedCache(backend, "feed", 3600)
+    for i in range(50):
+        feeds.set(["dining", f"P{i:04d}"], FEED)
+        feeds.set(["experiences", f"P{i:04d}"], FEED)
+
+
+def worker(path, seconds, worker_id, results):
+    backend = SQLiteBackend(path)
+    catalog = SharedCache(backend, "catalog", 3600)
+    feeds = SharedCache(backend, "feed", 3600)
+    responses = SharedCache(backend, "response", 3600)
+    rng = random.Random(worker_id)
+    turns = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        thread_id = f"thread_{worker_id}_{rng.randrange(200)}"
+        session = backend.get("session", thread_id, {})
+        session["turns"] = session.get("turns", 0) + 1
+        backend.set("session", thread_id, session, ttl=3600)
+        properties = catalog.get("properties")
+        owsCode = f"P{rng.randrange(50):04d}"
+        feeds.get(["dining", owsCode])
+        feeds.get(["experiences", owsCode])
+        responses.get(["list_properties", f"region {rng.randrange(8)}", []])
+        json.dumps(properties)
+        if rng.random() < 0.05:
+            backend.add("idempotency", f"{thread_id}:{turns}", {"status": "in_progress"}, ttl=3600)
+        turns += 1
+    results.put(turns)
+
+
+def run(path, workers, seconds):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, seconds, i, results))
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    total = sum(results.get() for _ in processes)
+    for p in processes:
+        p.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        seed(path)
+        baseline = None
+        print(f"{'workers':>8} {'turns/s':>10} {'scaling':>8}")
+        for workers in args.workers:
+            rate = run(path, workers, args.seconds)
+            baseline = baseline or rate
+            print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>7.2f}x")
+        sessions = SQLiteBackend(path).count("session")
+        print(f"\nsessions visible from the parent process: {sessions}")
+
+
+if __name__ == "__main__":
+    main()
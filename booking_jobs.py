@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def default_is_retryable(result):
+    """
+    Retry only calls the booking service never received (the handler marks
+    connection failures with "retryable"). After a read timeout the first
+    request may already have gone through, so it is final like any other error.
+    """
+    return isinstance(result, dict) and result.get("status") == "error" and bool(result.get("retryable"))
+
+
+class JobQueue:
+    """
+    Booking-service calls run as background jobs persisted in a local SQLite
+    database, so a slow booking backend doesn't hold up the assistant run.
+    Jobs survive restarts. A job whose worker died mid-call is not run again,
+    since the booking service may already have applied it: once its lease
+    expires it is marked FAILED with an "outcome_unknown" result. Several
+    processes may share the same database.
+    """
+
+    OUTCOME_UNKNOWN = {
+        "status": "error",
+        "outcome_unknown": True,
+        "message": "The booking service call was interrupted and may have gone through. Please check the cart before trying again.",
+    }
+
+    def __init__(self, path, workers=4, max_attempts=3, retry_backoff=1.0, lease_seconds=60):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self._handlers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " next_attempt_at REAL NOT NULL,"
+            " lease_expires_at REAL"
+            ")"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, next_attempt_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, fn, on_success=None, is_retryable=default_is_retryable):
+        """
+        Register the callable run for jobs of `kind`; it receives the job payload as kwargs.
+        on_success(payload, result) runs after a successful attempt.
+        """
+        self._handlers[kind] = (fn, on_success, is_retryable)
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"booking-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, kind, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        self.start()
+        job_id = f"job_{uuid.uuid4().hex}"
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(payload), PENDING, now, now, now),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def wait(self, job_id, timeout=0):
+        """
+        Return the job once it finishes or `timeout` seconds pass, whichever is first.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (SUCCEEDED, FAILED):
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            # Woken early by local completions; polling covers other processes
+            with self._wakeup:
+                self._wakeup.wait(min(remaining, 0.25))
+
+    def _claim(self):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_expires_at = NULL"
+                " WHERE status = ? AND lease_expires_at < ?",
+                (FAILED, json.dumps(self.OUTCOME_UNKNOWN), "worker lease expired", now, RUNNING, now),
+            ).rowcount
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs"
+                " WHERE status = ? AND next_attempt_at <= ?"
+                " ORDER BY created_at LIMIT 1",
+                (PENDING, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, lease_expires_at = ? WHERE id = ?",
+                    (RUNNING, now, now + self.lease_seconds, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if expired:
+            print(f"⚠️ {expired} booking job(s) lost their worker mid-call; marked failed with unknown outcome")
+            with self._wakeup:
+                self._wakeup.notify_all()
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None, retry_at=None):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, next_attempt_at = ?, lease_expires_at = NULL WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, now, retry_at or now, job_id),
+        )
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"⚠️ Booking job queue unavailable: {e}")
+                row = None
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(0.5)
+                continue
+            self._run(row)
+
+    def _run(self, row):
+        job_id, kind, attempts = row["id"], row["kind"], row["attempts"] + 1
+        payload = json.loads(row["payload"])
+        fn, on_success, is_retryable = self._handlers[kind]
+        try:
+            result = fn(**payload)
+            retry = is_retryable(result)
+            error = result.get("error") if retry else None
+        except Exception as e:
+            # The call may have reached the booking service before failing
+            print(f"❌ Booking job {job_id} ({kind}) raised: {e}")
+            result, retry, error = None, False, str(e)
+
+        if retry and attempts < self.max_attempts:
+            delay = self.retry_backoff * 2 ** (attempts - 1)
+            print(f"🔁 Retrying booking job {job_id} ({kind}) in {delay:.1f}s after attempt {attempts}: {error}")
+            self._finish(job_id, PENDING, result=result, error=error, retry_at=time.time() + delay)
+            return
+
+        if result is None or (isinstance(result, dict) and result.get("status") == "error"):
+            details = result if isinstance(result, dict) else {}
+            self._finish(job_id, FAILED, result=result, error=error or details.get("message") or details.get("error"))
+            return
+
+        if on_success:
+            try:
+                on_success(payload, result)
+            except Exception as e:
+                print(f"⚠️ on_success hook for booking job {job_id} failed: {e}")
+        self._finish(job_id, SUCCEEDED, result=result)
+
+    def stats(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: count for status, count in rows}
+        return {
+            "workers": len(self._threads),
+            **{status: counts.get(status, 0) for status in (PENDING, RUNNING, SUCCEEDED, FAILED)},
+        }
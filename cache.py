@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+
+# TTLs (seconds) for upstream data. Anything derived from these feeds
+# (e.g. cached assistant responses) must not outlive them.
+CATALOG_TTL = int(os.getenv("CATALOG_CACHE_TTL", 6 * 60 * 60))
+FEED_TTL = int(os.getenv("FEED_CACHE_TTL", 60 * 60))
+CALENDAR_TTL = int(os.getenv("CALENDAR_CACHE_TTL", 60 * 60))
+FX_TTL = int(os.getenv("FX_CACHE_TTL", 6 * 60 * 60))
+
+
+class TTLCache:
+    """
+    Small thread-safe key/value cache with a per-entry time-to-live
+    (None means the entry never expires).
+    """
+
+    def __init__(self, default_ttl, max_entries=1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+            self._data[key] = (expires_at, value)
+
+    def ttl_remaining(self, key):
+        """
+        Seconds until the entry expires (inf if never), or None if it is absent.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            remaining = entry[0] - time.monotonic()
+            return remaining if remaining > 0 else None
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        # Drop expired entries first, then the entry closest to expiry
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
@@ -0,0 +1,211 @@
+import threading
+
+# Fields an add-on response may use to report the booking service's view of the cart
+REMOTE_VERSION_KEYS = ("cart_version", "version")
+REMOTE_COUNT_KEYS = ("item_count", "items_count", "cart_count")
+
+
+def _remote_version(payload):
+    if not isinstance(payload, dict):
+        return None
+    return next((payload[key] for key in REMOTE_VERSION_KEYS if payload.get(key) is not None), None)
+
+
+def _remote_items(remote_cart):
+    return remote_cart.get("items") or remote_cart.get("addons") or remote_cart.get("add_ons") or []
+
+
+def _line_from_item(item, index):
+    if not isinstance(item, dict):
+        return str(index), {"sku_id": str(index), "price": None, "product_details": item, "quantity": 1}
+    sku_id = str(item.get("sku_id") or item.get("skuId") or item.get("id") or index)
+    return sku_id, {
+        "sku_id": sku_id,
+        "price": item.get("price"),
+        "product_details": item.get("product_details") or item.get("name"),
+        "quantity": item.get("quantity", 1),
+    }
+
+
+class CartStore:
+    """
+    Locally maintained cart per result_set_id, kept in the shared-state backend.
+    Add-on responses are applied as deltas; the booking service's cart is only
+    fetched again on a version mismatch or at checkout. Every change bumps the
+    cart version so callers can ask for just the lines changed since a version.
+    The booking service's own cart version, when it reports one, is tracked
+    separately as remote_version.
+    """
+
+    NAMESPACE = "cart"
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.deltas_applied = 0
+        self.reconciles = 0
+
+    def get(self, result_set_id):
+        return self.backend.get(self.NAMESPACE, str(result_set_id))
+
+    def _save(self, cart):
+        self.backend.set(self.NAMESPACE, str(cart["result_set_id"]), cart, ttl=self.ttl)
+
+    def start(self, result_set_id, booking):
+        """
+        Begin an empty cart for a new booking.
+        """
+        cart = {
+            "result_set_id": result_set_id,
+            "version": 0,
+            "booking": {
+                "destination": booking.get("property_name") or booking.get("destination"),
+                "start_date": booking.get("start_date"),
+                "end_date": booking.get("end_date"),
+                "persons": booking.get("persons"),
+                "price": booking.get("price"),
+            },
+            "lines": {},
+            "removed": {},
+            "remote_total": None,
+            "remote_version": None,
+        }
+        self._save(cart)
+        return cart
+
+    def record_addon(self, result_set_id, sku_id, price, details, response):
+        """
+        Apply a successful post_addons call. Returns (cart, needs_reconcile); the
+        cart is None when there is no local model for this result_set_id yet.
+        """
+        with self._lock:
+            cart = self.get(result_set_id)
+            if cart is None:
+                return None, True
+            cart["version"] += 1
+            key = str(sku_id)
+            line = cart["lines"].get(key)
+            if line:
+                line["quantity"] = line.get("quantity", 1) + 1
+                line["price"] = price
+            else:
+                line = {"sku_id": key, "price": price, "product_details": details, "quantity": 1}
+                cart["lines"][key] = line
+            line["version"] = cart["version"]
+            cart["removed"].pop(key, None)
+            # The booking service's total no longer includes this line
+            cart["remote_total"] = None
+            mismatch = self._mismatch(cart, response)
+            remote_version = _remote_version(response)
+            if remote_version is not None:
+                cart["remote_version"] = remote_version
+            self._save(cart)
+            self.deltas_applied += 1
+        return cart, mismatch
+
+    @staticmethod
+    def _mismatch(cart, response):
+        if not isinstance(response, dict):
+            return False
+        remote_version = _remote_version(response)
+        if remote_version is not None:
+            # Our add-on should be the only change since the version we last saw
+            known = cart.get("remote_version")
+            if isinstance(known, int) and isinstance(remote_version, int):
+                return remote_version != known + 1
+            return False
+        for key in REMOTE_COUNT_KEYS:
+            if response.get(key) is not None:
+                return response[key] != sum(line.get("quantity", 1) for line in cart["lines"].values())
+        return False
+
+    def reconcile(self, result_set_id, remote_cart):
+        """
+        Replace the local lines with the booking service's cart, bumping the
+        version on lines that actually changed.
+        """
+        if not isinstance(remote_cart, dict) or remote_cart.get("status") == "error":
+            return self.get(result_set_id)
+        with self._lock:
+            cart = self.get(result_set_id) or self.start(result_set_id, remote_cart)
+            version = cart["version"] + 1
+            remote_lines = dict(_line_from_item(item, i) for i, item in enumerate(_remote_items(remote_cart)))
+            changed = False
+            for key, line in remote_lines.items():
+                local = cart["lines"].get(key)
+                if local is None or any(local.get(field) != line[field] for field in ("price", "product_details", "quantity")):
+                    line["version"] = version
+                    changed = True
+                else:
+                    line["version"] = local["version"]
+            for key in cart["lines"]:
+                if key not in remote_lines:
+                    cart["removed"][key] = version
+                    changed = True
+            cart["lines"] = remote_lines
+            if changed:
+                cart["version"] = version
+            cart["remote_total"] = remote_cart.get("total") or remote_cart.get("total_price")
+            cart["remote_version"] = _remote_version(remote_cart)
+            for field in ("destination", "start_date", "end_date", "persons"):
+                if remote_cart.get(field) is not None:
+                    cart["booking"][field] = remote_cart[field]
+            self._save(cart)
+            self.reconciles += 1
+        return cart
+
+    @staticmethod
+    def changes_since(cart, version):
+        """
+        Lines added or changed, and sku_ids removed, after `version`.
+        """
+        return {
+            "result_set_id": cart["result_set_id"],
+            "version": cart["version"],
+            "since_version": version,
+            "changed_lines": [line for line in cart["lines"].values() if line.get("version", 0) > version],
+            "removed_sku_ids": [key for key, removed_at in cart["removed"].items() if removed_at > version],
+            "addons_total": CartStore.addons_total(cart),
+        }
+
+    @staticmethod
+    def addons_total(cart):
+        total = 0.0
+        for line in cart["lines"].values():
+            try:
+                total += float(line.get("price") or 0) * line.get("quantity", 1)
+            except (TypeError, ValueError):
+                continue
+        return round(total, 2)
+
+    @staticmethod
+    def as_payload(cart):
+        """
+        Full cart in the same shape the booking service returns.
+        """
+        payload = {
+            "result_set_id": cart["result_set_id"],
+            "version": cart["version"],
+            **{k: v for k, v in cart["booking"].items() if v is not None},
+            "items": [
+                {
+                    "sku_id": line["sku_id"],
+                    "name": line.get("product_details"),
+                    "price": line.get("price"),
+                    "quantity": line.get("quantity", 1),
+                }
+                for line in cart["lines"].values()
+            ],
+            "addons_total": CartStore.addons_total(cart),
+        }
+        if cart.get("remote_total") is not None:
+            payload["total"] = cart["remote_total"]
+        return payload
+
+    def stats(self):
+        return {
+            "carts": self.backend.count(self.NAMESPACE),
+            "deltas_applied": self.deltas_applied,
+            "reconciles": self.reconciles,
+        }
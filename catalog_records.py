@@ -0,0 +1,384 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+# Top-level payload keys that hold the product list; anything else is kept raw
+PRODUCT_LIST_KEYS = ("products", "items", "results")
+SKU_LIST_KEY = "skus"
+SKU_KEYS = ("skuId", "sku_id", "sku", "productId", "id")
+NAME_KEYS = ("name", "title", "productName")
+DESCRIPTION_KEYS = ("shortDescription", "description", "summary")
+PRICE_KEYS = ("price", "startingPrice", "minPrice", "amount")
+CURRENCY_KEYS = ("currencyCode", "currency")
+URL_KEYS = ("detailPageUrl", "url")
+# Product fields that come from the feed's language rather than its currency
+TEXT_FIELDS = ("name", "description", "detailPageUrl")
+# Output key of each normalized field, unless the payload used another of its keys
+OUTPUT_KEYS = {
+    SKU_KEYS: "skuId",
+    NAME_KEYS: "name",
+    DESCRIPTION_KEYS: "description",
+    PRICE_KEYS: "price",
+    CURRENCY_KEYS: "currencyCode",
+    URL_KEYS: "detailPageUrl",
+}
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+_shared_aliases = {}
+
+
+def intern_aliases(aliases):
+    """
+    One shared (never mutated) dict per distinct alias mapping; a feed only has a few.
+    """
+    if not aliases:
+        return None
+    key = tuple(sorted(aliases.items()))
+    return _shared_aliases.setdefault(key, {intern(k): intern(v) for k, v in key})
+
+
+@dataclass(frozen=True, slots=True)
+class PropertyRecord:
+    name: str
+    owsCode: str
+    tripteaseAPIKey: Optional[str]
+    region: str
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "owsCode": self.owsCode,
+            "tripteaseAPIKey": self.tripteaseAPIKey,
+            "region": self.region,
+        }
+
+
+def _compact(result):
+    return {key: value for key, value in result.items() if value is not None}
+
+
+def _with_extra(extra, aliases, fields):
+    """
+    `extra` plus the normalized `fields`, each under the payload key it was
+    read from (see `aliases`), so no field of the payload is overwritten.
+    """
+    aliases = aliases or {}
+    result = dict(extra or {})
+    for key, value in fields.items():
+        key = aliases.get(key, key)
+        if value is not None and key not in result:
+            result[key] = value
+    return result
+
+
+@dataclass(frozen=True, slots=True)
+class SkuRecord:
+    sku_id: Optional[str]
+    name: Optional[str]
+    price: Optional[float]
+    currency: Optional[str]
+    # Fields of the SKU not covered above, as in the payload
+    extra: Optional[dict] = None
+    # Output key -> payload key, for fields read from a non-default key
+    aliases: Optional[dict] = None
+
+    def to_dict(self, price=None, currency=None, name=None):
+        return _with_extra(self.extra, self.aliases, {
+            "skuId": self.sku_id,
+            "name": name or self.name,
+            "price": self.price if price is None else price,
+            "currencyCode": currency or self.currency,
+        })
+
+
+@dataclass(frozen=True, slots=True)
+class ProductRecord:
+    sku_id: Optional[str]
+    name: str
+    description: Optional[str]
+    price: Optional[float]
+    currency: Optional[str]
+    detail_page_url: Optional[str]
+    category: str
+    # Every SKU of the product (e.g. "dinner for 2" and "dinner for 4")
+    skus: tuple = ()
+    # Fields of the product not covered above, as in the payload
+    extra: Optional[dict] = None
+    # Output key -> payload key, for fields read from a non-default key
+    aliases: Optional[dict] = None
+
+    def to_dict(self, convert=None, currency=None, text=None):
+        """
+        Tool-output dict. With `currency`, prices are converted via
+        convert(amount, source, target) and left as-is where no rate is
+        known; `text` holds localized TEXT_FIELDS and SKU names.
+        """
+        text = text or {}
+
+        def price_in(amount, source):
+            if currency and convert and amount is not None and source != currency:
+                converted = convert(amount, source, currency)
+                if converted is not None:
+                    return converted, currency
+            return None, None
+
+        price, price_currency = price_in(self.price, self.currency)
+        skus = []
+        for sku in self.skus:
+            sku_price, sku_currency = price_in(sku.price, sku.currency or self.currency)
+            skus.append(sku.to_dict(sku_price, sku_currency, text.get("skus", {}).get(sku.sku_id)))
+        result = _with_extra(self.extra, self.aliases, {
+            "skuId": self.sku_id,
+            "name": text.get("name", self.name),
+            "description": text.get("description", self.description),
+            "price": self.price if price is None else price,
+            "currencyCode": price_currency or self.currency,
+            "detailPageUrl": text.get("detailPageUrl", self.detail_page_url),
+            # The product's own category field, if any, wins
+            "category": self.category,
+        })
+        if skus:
+            result["skus"] = skus
+        return result
+
+    def key(self, index):
+        """
+        Stable key for matching this product across language variants of a feed.
+        """
+        return self.sku_id or str(index)
+
+
+@dataclass(frozen=True, slots=True)
+class ProductFeed:
+    owsCode: str
+    category: str
+    products: tuple
+    # Original payload, kept instead of products when its layout isn't recognised
+    raw: Optional[dict] = None
+    # Top-level payload fields other than the product list (e.g. filters)
+    meta: Optional[dict] = None
+
+    def to_output(self, currency=None, convert=None, texts=None):
+        """
+        JSON-ready tool output, optionally converted to `currency` and
+        localized with `texts` (product key -> ProductRecord.to_dict text).
+        """
+        if self.raw is not None:
+            return self.raw
+        texts = texts or {}
+        return {
+            **(self.meta or {}),
+            "owsCode": self.owsCode,
+            "category": self.category,
+            "products": [
+                product.to_dict(convert, currency, texts.get(product.key(index)))
+                for index, product in enumerate(self.products)
+            ],
+        }
+
+    def texts(self):
+        """
+        Language-dependent fields per product key, for localizing a feed fetched in another language.
+        """
+        texts = {}
+        for index, product in enumerate(self.products):
+            item = _compact({"name": product.name, "description": product.description, "detailPageUrl": product.detail_page_url})
+            item["skus"] = {sku.sku_id: sku.name for sku in product.skus if sku.sku_id and sku.name}
+            texts[product.key(index)] = item
+        return texts
+
+
+# =============================
+# Catalog
+# =============================
+def catalog_from_regions(data):
+    return [
+        PropertyRecord(
+            name=prop["name"],
+            owsCode=prop["owsCode"],
+            tripteaseAPIKey=prop.get("tripteaseAPIKey"),
+            region=intern(region["title"]),
+        )
+        for region in data.get("regions", [])
+        for prop in region.get("properties", [])
+    ]
+
+
+def encode_catalog(records):
+    """
+    Column-wise JSON/msgpack-friendly form with each region title stored once.
+    """
+    regions = []
+    region_index = {}
+    columns = {"name": [], "owsCode": [], "tripteaseAPIKey": [], "region": []}
+    for record in records:
+        if record.region not in region_index:
+            region_index[record.region] = len(regions)
+            regions.append(record.region)
+        columns["name"].append(record.name)
+        columns["owsCode"].append(record.owsCode)
+        columns["tripteaseAPIKey"].append(record.tripteaseAPIKey)
+        columns["region"].append(region_index[record.region])
+    return {"regions": regions, "columns": columns}
+
+
+def decode_catalog(packed):
+    regions = [intern(region) for region in packed["regions"]]
+    columns = packed["columns"]
+    return [
+        PropertyRecord(name, owsCode, key, regions[region])
+        for name, owsCode, key, region in zip(
+            columns["name"], columns["owsCode"], columns["tripteaseAPIKey"], columns["region"]
+        )
+    ]
+
+
+# =============================
+# Product feeds
+# =============================
+def _amount(value):
+    if isinstance(value, dict):
+        value = value.get("amount", value.get("value"))
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_product_list(payload):
+    """
+    (products, other top-level fields) for a payload whose layout is known,
+    or (None, None) so the caller keeps it raw.
+    """
+    if isinstance(payload, list):
+        return payload, None
+    if not isinstance(payload, dict):
+        return None, None
+    for key in PRODUCT_LIST_KEYS:
+        if isinstance(payload.get(key), list):
+            return payload[key], {k: v for k, v in payload.items() if k != key} or None
+    return None, None
+
+
+def _take(node, keys, used, aliases):
+    for key in keys:
+        if node.get(key) not in (None, ""):
+            used.add(key)
+            if key != OUTPUT_KEYS[keys]:
+                aliases[OUTPUT_KEYS[keys]] = key
+            return node[key]
+    return None
+
+
+def _price(node, used, aliases):
+    price = _take(node, PRICE_KEYS, used, aliases)
+    currency = _take(node, CURRENCY_KEYS, used, aliases)
+    if currency is None and isinstance(price, dict):
+        currency = price.get("currencyCode") or price.get("currency")
+    return _amount(price), intern(currency) if isinstance(currency, str) else None
+
+
+def sku_from_item(sku):
+    used, aliases = set(), {}
+    sku_id = _take(sku, SKU_KEYS, used, aliases)
+    name = _take(sku, NAME_KEYS, used, aliases)
+    price, currency = _price(sku, used, aliases)
+    extra = {key: value for key, value in sku.items() if key not in used}
+    return SkuRecord(
+        sku_id=str(sku_id) if sku_id is not None else None,
+        name=name if isinstance(name, str) else None,
+        price=price,
+        currency=currency,
+        extra=extra or None,
+        aliases=intern_aliases(aliases),
+    )
+
+
+def product_from_item(item, category):
+    if not isinstance(item, dict):
+        return None
+    used, aliases = set(), {}
+    name = _take(item, NAME_KEYS, used, aliases)
+    if not isinstance(name, str):
+        return None
+    skus = ()
+    if isinstance(item.get(SKU_LIST_KEY), list):
+        if not all(isinstance(sku, dict) for sku in item[SKU_LIST_KEY]):
+            return None
+        used.add(SKU_LIST_KEY)
+        skus = tuple(sku_from_item(sku) for sku in item[SKU_LIST_KEY])
+    sku_id = _take(item, SKU_KEYS, used, aliases)
+    price, currency = _price(item, used, aliases)
+    first = skus[0] if skus else None
+    if price is None and first:
+        price, currency = first.price, currency or first.currency
+    if sku_id is None and first:
+        sku_id = first.sku_id
+    description = _take(item, DESCRIPTION_KEYS, used, aliases)
+    url = _take(item, URL_KEYS, used, aliases)
+    extra = {key: value for key, value in item.items() if key not in used}
+    return ProductRecord(
+        sku_id=str(sku_id) if sku_id is not None else None,
+        name=name,
+        description=description,
+        price=price,
+        currency=currency,
+        detail_page_url=url,
+        category=intern(category),
+        skus=skus,
+        extra=extra or None,
+        aliases=intern_aliases(aliases),
+    )
+
+
+def parse_product_feed(payload, owsCode, category):
+    """
+    Reduce a product availability payload to compact ProductRecords. The
+    product list must sit under one of PRODUCT_LIST_KEYS and every item must
+    be recognisable; otherwise the payload is kept as-is.
+    """
+    items, meta = _find_product_list(payload)
+    products = tuple(product_from_item(item, category) for item in items or ())
+    if not products or any(product is None for product in products):
+        return ProductFeed(owsCode=owsCode, category=intern(category), products=(), raw=payload)
+    return ProductFeed(owsCode=owsCode, category=intern(category), products=products, meta=meta)
+
+
+def _encode_sku(sku):
+    return [sku.sku_id, sku.name, sku.price, sku.currency, sku.extra, sku.aliases]
+
+
+def encode_feed(feed):
+    return {
+        "owsCode": feed.owsCode,
+        "category": feed.category,
+        "products": [
+            [p.sku_id, p.name, p.description, p.price, p.currency, p.detail_page_url, [_encode_sku(s) for s in p.skus], p.extra, p.aliases]
+            for p in feed.products
+        ],
+        "raw": feed.raw,
+        "meta": feed.meta,
+    }
+
+
+def decode_feed(packed):
+    category = intern(packed["category"])
+    return ProductFeed(
+        owsCode=packed["owsCode"],
+        category=category,
+        products=tuple(
+            ProductRecord(
+                sku_id, name, description, price, intern(currency), url, category,
+                skus=tuple(SkuRecord(s_id, s_name, s_price, intern(s_currency), s_extra, intern_aliases(s_aliases)) for s_id, s_name, s_price, s_currency, s_extra, s_aliases in skus),
+                extra=extra,
+                aliases=intern_aliases(aliases),
+            )
+            for sku_id, name, description, price, currency, url, skus, extra, aliases in packed["products"]
+        ),
+        raw=packed.get("raw"),
+        meta=packed.get("meta"),
+    )
@@ -0,0 +1,92 @@
+import threading
+
+# Rough OpenAI token estimate; good enough for deciding when to compact
+CHARS_PER_TOKEN = 4
+# Turns on either side of a compaction used to compare latency
+LATENCY_WINDOW = 3
+
+
+def estimate_tokens(text) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def should_compact(session: dict, max_tokens: int, max_messages: int) -> bool:
+    return (
+        session.get("thread_tokens", 0) >= max_tokens
+        or session.get("thread_messages", 0) >= max_messages
+    )
+
+
+def build_summary(session: dict, property_name=None, cart=None, last_response=None, max_response_chars=1500) -> str:
+    """
+    Compact description of the session state used to seed a fresh thread.
+    """
+    lines = [
+        "📌 CONVERSATION SUMMARY (earlier messages were compacted; treat this as the current state)",
+        "",
+    ]
+    owsCode = session.get("owsCode")
+    if property_name or owsCode:
+        lines.append(f"- Selected property: {property_name or 'Unknown'} (owsCode: {owsCode or 'unknown'})")
+    if session.get("start_date") and session.get("end_date"):
+        lines.append(f"- Stay dates: {session['start_date']} to {session['end_date']}")
+    if session.get("persons"):
+        lines.append(f"- Guests: {session['persons']}")
+    if session.get("result_set_id"):
+        lines.append(f"- Existing booking result_set_id: {session['result_set_id']} (use this; do NOT create a new booking)")
+    if cart:
+        lines.append(f"- Current cart: {cart}")
+    if len(lines) == 2:
+        lines.append("- No property selected or booking made yet.")
+    if last_response:
+        response = last_response if len(last_response) <= max_response_chars else last_response[:max_response_chars] + " …"
+        lines.extend(["", "Your last reply to the guest was:", response])
+    return "\n".join(lines)
+
+
+class CompactionStats:
+    """
+    Counts compactions and compares assistant turn latency on long threads
+    just before compaction with the first turns on the compacted thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.tokens_dropped = 0
+        self.before = []
+        self.after = []
+
+    def record_compaction(self, session: dict):
+        with self._lock:
+            self.compactions += 1
+            self.tokens_dropped += session.get("thread_tokens", 0)
+            self.before.extend(session.get("recent_latencies", [])[-LATENCY_WINDOW:])
+
+    def record_turn(self, session: dict, seconds: float):
+        """
+        Record a completed assistant turn; returns the session fields to persist.
+        """
+        recent = (session.get("recent_latencies", []) + [round(seconds, 3)])[-LATENCY_WINDOW:]
+        turns_since = session.get("turns_since_compaction")
+        if turns_since is not None and turns_since < LATENCY_WINDOW:
+            with self._lock:
+                self.after.append(seconds)
+        return {
+            "recent_latencies": recent,
+            "turns_since_compaction": None if turns_since is None else turns_since + 1,
+        }
+
+    def stats(self):
+        with self._lock:
+            def avg_ms(samples):
+                return round(1000 * sum(samples) / len(samples), 1) if samples else None
+
+            return {
+                "compactions": self.compactions,
+                "tokens_dropped": self.tokens_dropped,
+                "avg_turn_ms_before": avg_ms(self.before),
+                "avg_turn_ms_after": avg_ms(self.after),
+                "samples_before": len(self.before),
+                "samples_after": len(self.after),
+            }
@@ -0,0 +1,180 @@
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+
+MONTH_NAMES = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+# Full names and the usual abbreviations; other prefixes ("mar" in "married") aren't months
+MONTH_WORDS = {name: i + 1 for i, name in enumerate(MONTH_NAMES)}
+MONTH_WORDS.update({name[:3]: i + 1 for i, name in enumerate(MONTH_NAMES)})
+MONTH_WORDS.update({"sept": 9})
+ORDINAL = r"(?:st|nd|rd|th)?"
+MONTH_DAY = re.compile(rf"^([a-z]+)\.?\s+(\d{{1,2}}){ORDINAL}(?:\s+(\d{{4}}))?$")
+DAY_MONTH = re.compile(rf"^(\d{{1,2}}){ORDINAL}\s+(?:of\s+)?([a-z]+)\.?(?:\s+(\d{{4}}))?$")
+BARE_DAY = re.compile(rf"^(\d{{1,2}}){ORDINAL}$")
+# A lookahead so "from 20th of may" also tries "20th of may" after rejecting "from 20"
+DATE_IN_TEXT = re.compile(rf"\b(?=(?:(\d{{1,2}}){ORDINAL}\s+(?:of\s+)?([a-z]{{3,9}})|([a-z]{{3,9}})\.?\s+(\d{{1,2}}){ORDINAL})\b)")
+NIGHTS = re.compile(r"\b(\d{1,2})\s+nights?\b")
+# Weekend stays check in on Friday and check out on Sunday
+WEEKEND_NIGHTS = 2
+
+
+def month_number(word):
+    return MONTH_WORDS.get(word.lower().rstrip("."))
+
+
+def _next_occurrence(month, day, floor):
+    """
+    First month/day on or after `floor`, rolling over into later years.
+    """
+    for year in range(floor.year, floor.year + 9):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            # Feb 29 outside a leap year; other invalid days never resolve
+            if not (month == 2 and day == 29):
+                return None
+            continue
+        if candidate >= floor:
+            return candidate
+    return None
+
+
+def parse_day(fragment, today, after=None):
+    """
+    Resolve "2026-12-20", "Dec 20", "20 Dec", "20th of December 2026" or, for
+    an end date, a bare "25" to a date. Dates without a year are the next
+    occurrence on or after today (or after `after`, the check-in date).
+    Returns None if the fragment isn't a date.
+    """
+    text = " ".join(str(fragment).lower().replace(",", " ").split())
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        pass
+    floor = after + timedelta(days=1) if after else today
+
+    match = MONTH_DAY.match(text)
+    if match:
+        month, day, year = month_number(match.group(1)), int(match.group(2)), match.group(3)
+    else:
+        match = DAY_MONTH.match(text)
+        if match:
+            day, month, year = int(match.group(1)), month_number(match.group(2)), match.group(3)
+        elif after and BARE_DAY.match(text):
+            # "Dec 20 to 25": same month as check-in, or the next one
+            day, year = int(BARE_DAY.match(text).group(1)), None
+            month = after.month if day > after.day else after.month % 12 + 1
+        else:
+            return None
+    if not month:
+        return None
+    if year:
+        try:
+            return date(int(year), month, day)
+        except ValueError:
+            return None
+    return _next_occurrence(month, day, floor)
+
+
+def weekend(today, weeks_ahead=0):
+    """
+    (Friday, Sunday) of this weekend, or of the one `weeks_ahead` later.
+    On a Saturday "this weekend" starts today; on a Sunday it is the coming one.
+    """
+    if today.weekday() == 5:
+        start = today
+    else:
+        start = today + timedelta(days=(4 - today.weekday()) % 7)
+    start += timedelta(weeks=weeks_ahead)
+    friday = start - timedelta(days=start.weekday() - 4)
+    return start, friday + timedelta(days=WEEKEND_NIGHTS)
+
+
+def _date_in_text(text, today):
+    for match in DATE_IN_TEXT.finditer(text):
+        # "I may 2 people": in free text, month-first "may" is the verb
+        if match.group(3) == "may":
+            continue
+        fragment = f"{match.group(1)} {match.group(2)}" if match.group(1) else f"{match.group(3)} {match.group(4)}"
+        resolved = parse_day(fragment, today)
+        if resolved:
+            return resolved
+    return None
+
+
+@lru_cache(maxsize=2048)
+def resolve_stay(start_text, end_text, text, today):
+    """
+    ISO (start_date, end_date) for the dates parse_complex_request extracted
+    ("Dec 20" / "25"), or for phrases in the request such as "next weekend",
+    "tomorrow for 3 nights" or "20 Dec for 5 nights". None if the request
+    doesn't pin down both dates. `today` is part of the cache key.
+    """
+    if start_text:
+        start = parse_day(start_text, today)
+        end = parse_day(end_text, today, after=start) if start and end_text else None
+        if start and end and end > start:
+            return start.isoformat(), end.isoformat()
+
+    lowered = " ".join((text or "").lower().split())
+    match = NIGHTS.search(lowered)
+    nights = int(match.group(1)) if match and int(match.group(1)) > 0 else None
+    end = None
+    if "next weekend" in lowered:
+        start, end = weekend(today, weeks_ahead=1)
+    elif "this weekend" in lowered or "the weekend" in lowered:
+        start, end = weekend(today)
+    elif "tonight" in lowered or re.search(r"\bfrom today\b|\bstarting today\b", lowered):
+        start = today
+    elif "tomorrow" in lowered:
+        start = today + timedelta(days=1)
+    else:
+        start = _date_in_text(lowered, today)
+    if start is None:
+        return None
+    if nights:
+        end = start + timedelta(days=nights)
+    if end is None:
+        return None
+    return start.isoformat(), end.isoformat()
+
+
+def validate_stay(start_date, end_date, today=None):
+    """
+    Check a stay's dates for tool calls. Accepts ISO dates or the natural
+    fragments parse_day understands. Returns (start_iso, end_iso, None), or
+    (None, None, error) where error is the tool-output dict to return.
+    """
+    today = today or date.today()
+    start = parse_day(start_date, today) if start_date else None
+    end = parse_day(end_date, today, after=start) if end_date and start else None
+    if start is None or end is None:
+        return None, None, {
+            "status": "error",
+            "message": "❌ Invalid date format. Please use YYYY-MM-DD for start_date and end_date.",
+            "next_action": "ask_new_dates",
+            "earliest_date": today.isoformat(),
+        }
+    if start < today:
+        return None, None, {
+            "status": "error",
+            "message": f"❌ Start date {start_date} is in the past. Please choose a date on or after {today.isoformat()}.",
+            "next_action": "ask_new_dates",
+            "earliest_date": today.isoformat(),
+        }
+    if end <= start:
+        return None, None, {
+            "status": "error",
+            "message": f"❌ End date {end_date} must be after start date {start_date}.",
+            "next_action": "ask_new_dates",
+            "earliest_date": today.isoformat(),
+        }
+    return start.isoformat(), end.isoformat(), None
+
+
+def stats():
+    info = resolve_stay.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "cached": info.currsize}
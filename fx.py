@@ -0,0 +1,83 @@
+import time
+import threading
+
+import requests
+
+
+class FxTable:
+    """
+    Exchange rates from one base currency, fetched from `url` (formatted with
+    {base}; the response must carry a {"rates": {currency: rate}} map) and
+    kept in `cache` so every worker shares one upstream call per TTL.
+    The last fetched table keeps serving through an FX outage, and after a
+    failed fetch the upstream isn't retried for `retry_after` seconds.
+    """
+
+    CACHE_KEY = "rates"
+
+    def __init__(self, base, url, cache, timeout=5, retry_after=60):
+        self.base = base.upper()
+        self.url = url
+        self.cache = cache
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._last_known = None
+        self._retry_at = 0.0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.conversions = 0
+
+    @property
+    def enabled(self):
+        return bool(self.url)
+
+    def rates(self):
+        if not self.enabled:
+            return None
+        cached = self.cache.get(self.CACHE_KEY)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self.cache.get(self.CACHE_KEY)
+            if cached is not None:
+                return cached
+            if time.monotonic() < self._retry_at:
+                return self._last_known
+            try:
+                response = requests.get(self.url.format(base=self.base), timeout=self.timeout)
+                response.raise_for_status()
+                rates = {code.upper(): float(rate) for code, rate in response.json()["rates"].items()}
+            except (requests.exceptions.RequestException, KeyError, TypeError, ValueError, AttributeError) as e:
+                self.fetch_errors += 1
+                self._retry_at = time.monotonic() + self.retry_after
+                print(f"⚠️ FX rates unavailable, {'serving last known rates' if self._last_known else 'prices stay in ' + self.base}: {e}")
+                return self._last_known
+            rates[self.base] = 1.0
+            self.fetches += 1
+            self._last_known = rates
+            self.cache.set(self.CACHE_KEY, rates)
+            return rates
+
+    def convert(self, amount, source, target):
+        """
+        Convert amount between currencies, or None if either rate is unknown.
+        """
+        source, target = (source or self.base).upper(), target.upper()
+        if amount is None or source == target:
+            return amount
+        rates = self.rates()
+        if not rates or source not in rates or target not in rates:
+            return None
+        self.conversions += 1
+        return round(amount / rates[source] * rates[target], 2)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "base": self.base,
+            "currencies": len(self._last_known or {}),
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "conversions": self.conversions,
+        }
@@ -0,0 +1,193 @@
+import re
+import threading
+
+# Only short, unambiguous utterances are routed locally. Anything that merely
+# mentions a cart or checkout inside a longer request goes to the assistant.
+ROUTES = [
+    ("view_cart", re.compile(
+        r"(please\s+)?(show|view|see|display|review|open)\s+(me\s+)?(my|the)\s+(cart|basket|booking\s+summary)(\s+please)?",
+        re.IGNORECASE,
+    )),
+    ("view_cart", re.compile(r"(what'?s|what\s+is)\s+in\s+(my|the)\s+(cart|basket)", re.IGNORECASE)),
+    ("view_cart", re.compile(r"(my\s+)?(cart|basket)", re.IGNORECASE)),
+    ("checkout", re.compile(
+        r"(please\s+)?(i\s+want\s+to\s+|let'?s\s+)?(proceed\s+to\s+|go\s+to\s+)?check\s*out(\s+now)?(\s+please)?",
+        re.IGNORECASE,
+    )),
+]
+
+KEYWORDS = {
+    "view_cart": re.compile(r"\b(cart|basket)\b", re.IGNORECASE),
+    "checkout": re.compile(r"\bcheck\s*out\b", re.IGNORECASE),
+}
+
+MIN_CONFIDENCE = 0.9
+
+
+def _normalize(user_input: str) -> str:
+    return " ".join(user_input.strip().rstrip(".!?").split())
+
+
+def match_intent(user_input: str):
+    """
+    Classify a turn against the local routes.
+    Returns (intent, confidence); intent is None when nothing matched.
+    """
+    text = _normalize(user_input)
+    for intent, pattern in ROUTES:
+        if pattern.fullmatch(text):
+            return intent, 1.0
+    # Keyword-only matches are reported but never routed
+    for intent, pattern in KEYWORDS.items():
+        if pattern.search(text):
+            return intent, 0.5
+    return None, 0.0
+
+
+def render_cart(cart: dict, result_set_id) -> str:
+    if not isinstance(cart, dict) or cart.get("status") == "error":
+        message = cart.get("message") if isinstance(cart, dict) else None
+        return f"❌ I couldn't load your cart right now. {message or 'Please try again shortly.'}"
+
+    lines = [f"🛒 **Your cart** (booking reference `{result_set_id}`)", ""]
+    destination = cart.get("destination")
+    if destination:
+        stay = f"🏨 **{destination}**"
+        if cart.get("start_date") and cart.get("end_date"):
+            stay += f" — {cart['start_date']} to {cart['end_date']}"
+        if cart.get("persons"):
+            stay += f", {cart['persons']} guests"
+        lines.append(stay)
+
+    items = cart.get("items") or cart.get("addons") or cart.get("add_ons") or []
+    if items:
+        lines.append("")
+        lines.append("**Add-ons:**")
+        for item in items:
+            if not isinstance(item, dict):
+                lines.append(f"- {item}")
+                continue
+            name = item.get("name") or item.get("product_details") or item.get("sku_id", "Add-on")
+            price = item.get("price")
+            lines.append(f"- {name}" + (f" — {price}" if price is not None else ""))
+    else:
+        lines.append("")
+        lines.append("No add-ons in your cart yet.")
+
+    total = cart.get("total") or cart.get("total_price")
+    if total is not None:
+        lines.append("")
+        lines.append(f"**Total:** {total}")
+    lines.append("")
+    lines.append("Would you like to add dining or experiences, or proceed to checkout?")
+    return "\n".join(lines)
+
+
+def render_checkout(result: dict, result_set_id) -> str:
+    if not isinstance(result, dict) or result.get("status") == "error":
+        message = result.get("message") if isinstance(result, dict) else None
+        return f"❌ Checkout could not be completed. {message or 'Please try again shortly.'}"
+
+    if result.get("status") == "pending":
+        return (
+            f"⏳ Your checkout for booking reference `{result_set_id}` is being processed "
+            f"(job `{result.get('job_id')}`). I'll confirm as soon as the booking service responds."
+        )
+
+    lines = [f"✅ **Checkout complete** for booking reference `{result_set_id}`."]
+    if result.get("message"):
+        lines.append("")
+        lines.append(result["message"])
+    total = result.get("total") or result.get("total_price")
+    if total is not None:
+        lines.append("")
+        lines.append(f"**Total charged:** {total}")
+    lines.append("")
+    lines.append("Thank you for choosing Four Seasons. Is there anything else I can help you with?")
+    return "\n".join(lines)
+
+
+class IntentRouter:
+    """
+    Deterministic fast path for high-confidence intents that map to a single
+    wrapper call. Tracks per-intent hit rate and latency saved versus a full
+    assistant run.
+    """
+
+    def __init__(self, enabled=True, min_confidence=MIN_CONFIDENCE):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._intents = {}
+        self.turns = 0
+        # Exponential moving average of full assistant turn latency (seconds)
+        self.llm_turn_seconds = None
+
+    def route(self, user_input: str):
+        """
+        Return the intent to handle locally, or None to fall back to the assistant.
+        """
+        if not self.enabled:
+            return None
+        intent, confidence = match_intent(user_input)
+        with self._lock:
+            self.turns += 1
+            if intent:
+                stats = self._stats_for(intent)
+                if confidence < self.min_confidence:
+                    stats["low_confidence"] += 1
+        if intent and confidence >= self.min_confidence:
+            return intent
+        return None
+
+    def record_fallback(self, intent, reason):
+        with self._lock:
+            stats = self._stats_for(intent)
+            stats["fallbacks"] += 1
+            stats["last_fallback_reason"] = reason
+
+    def record_hit(self, intent, seconds):
+        with self._lock:
+            stats = self._stats_for(intent)
+            stats["hits"] += 1
+            stats["handler_seconds"] += seconds
+            if self.llm_turn_seconds is not None:
+                stats["seconds_saved"] += max(self.llm_turn_seconds - seconds, 0.0)
+
+    def record_llm_turn(self, seconds):
+        with self._lock:
+            if self.llm_turn_seconds is None:
+                self.llm_turn_seconds = seconds
+            else:
+                self.llm_turn_seconds = 0.9 * self.llm_turn_seconds + 0.1 * seconds
+
+    def stats(self):
+        with self._lock:
+            intents = {}
+            for intent, stats in self._intents.items():
+                candidates = stats["hits"] + stats["fallbacks"] + stats["low_confidence"]
+                intents[intent] = {
+                    **stats,
+                    "hit_rate": round(stats["hits"] / candidates, 3) if candidates else 0.0,
+                    "avg_handler_ms": round(1000 * stats["handler_seconds"] / stats["hits"], 1) if stats["hits"] else None,
+                    "seconds_saved": round(stats["seconds_saved"], 3),
+                }
+            return {
+                "enabled": self.enabled,
+                "turns": self.turns,
+                "avg_llm_turn_ms": round(1000 * self.llm_turn_seconds, 1) if self.llm_turn_seconds is not None else None,
+                "intents": intents,
+            }
+
+    def _stats_for(self, intent):
+        if intent not in self._intents:
+            self._intents[intent] = {
+                "hits": 0,
+                "fallbacks": 0,
+                "low_confidence": 0,
+                "handler_seconds": 0.0,
+                "seconds_saved": 0.0,
+                "last_fallback_reason": None,
+            }
+        return self._intents[intent]
+
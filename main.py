@@ -8,6 +8,22 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from datetime import date
 import re
+from collections import Counter
+
+from cache import CATALOG_TTL, FEED_TTL, CALENDAR_TTL, FX_TTL
+from shared_state import create_backend, SharedCache
+from response_cache import ResponseCache
+from intent_router import IntentRouter, render_cart, render_checkout
+from prefetch import Prefetcher
+from pricing import RateRow, RateTable, parse_calendar
+from booking_jobs import JobQueue, SUCCEEDED, FAILED
+from cart_state import CartStore
+from fx import FxTable
+from dates import resolve_stay, validate_stay
+from profiling import mark
+from compaction import CompactionStats, build_summary, estimate_tokens, should_compact
+from catalog_records import catalog_from_regions, encode_catalog, decode_catalog, parse_product_feed, encode_feed, decode_feed
+from concurrent.futures import ThreadPoolExecutor
 
 # Suppress Deprecation Warnings for now
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -23,6 +39,9 @@ if not openai.api_key or not ASSISTANT_ID:
         "❌ Missing OPENAI_API_KEY or ASSISTANT_ID in your .env file"
     )
 
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+
 # Global state
 property_lookup = {}
 selected_property = None
@@ -31,6 +50,79 @@ booking_settings = {}
 booking_flow = {}
 result_set_id = None
 
+# Shared state: sessions, caches and idempotency keys live in a backend that
+# every worker process can see (STATE_BACKEND=sqlite for multi-worker deployments)
+state_backend = create_backend()
+SESSION_TTL = int(os.getenv("SESSION_TTL", 7 * 24 * 60 * 60))
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+PRICING_MAX_PROPERTIES = int(os.getenv("PRICING_MAX_PROPERTIES", 300))
+PRICING_FETCH_WORKERS = int(os.getenv("PRICING_FETCH_WORKERS", 8))
+# Uncached calendars fetched inside one find_cheapest_stay call; the rest load in the background
+PRICING_MAX_COLD_FETCHES = int(os.getenv("PRICING_MAX_COLD_FETCHES", 16))
+# Threads past either limit are replaced by a fresh thread seeded with a summary
+COMPACT_MAX_TOKENS = int(os.getenv("COMPACT_MAX_TOKENS", 30000))
+COMPACT_MAX_MESSAGES = int(os.getenv("COMPACT_MAX_MESSAGES", 40))
+# How long a tool call waits for a booking job before handing back a job id
+BOOKING_INLINE_WAIT = float(os.getenv("BOOKING_INLINE_WAIT", 3))
+# Product feeds are fetched once in this language and currency; other currencies
+# are converted locally from FX_RATES_URL and other languages fetched lazily for text only
+FEED_LANGUAGE = os.getenv("FEED_LANGUAGE", "en").lower()
+FEED_CURRENCY = os.getenv("FEED_CURRENCY", "INR").upper()
+FX_RATES_URL = os.getenv("FX_RATES_URL", "")
+FEED_URL = (
+    "https://www.fourseasons.com/alt/apps/fshr/feeds/product/availability"
+    "?language={language}&owsCode={owsCode}&categoryId={category}&currencyCode={currency}"
+    "&sourceName=Web+-+Shopping&timestamp=29190705&version=4"
+)
+
+# Caches
+catalog_cache = SharedCache(state_backend, "catalog", default_ttl=CATALOG_TTL, encode=encode_catalog, decode=decode_catalog)
+feed_cache = SharedCache(state_backend, "feed", default_ttl=FEED_TTL, encode=encode_feed, decode=decode_feed)
+feed_text_cache = SharedCache(state_backend, "feed_text", default_ttl=FEED_TTL)
+calendar_cache = SharedCache(state_backend, "calendar", default_ttl=CALENDAR_TTL, encode=RateRow.encode, decode=RateRow.decode)
+fx_table = FxTable(FEED_CURRENCY, FX_RATES_URL, SharedCache(state_backend, "fx", default_ttl=FX_TTL))
+response_cache = ResponseCache(
+    enabled=RESPONSE_CACHE_ENABLED,
+    cache=SharedCache(state_backend, "response", default_ttl=FEED_TTL),
+)
+# Last successfully fetched upstream data, also seeded from the startup snapshot
+last_known_catalog = None
+last_known_feeds = {}
+# How often each property's feeds are requested; the hottest are snapshotted
+feed_hits = Counter()
+intent_router = IntentRouter(enabled=INTENT_ROUTER_ENABLED)
+booking_jobs = JobQueue(
+    path=os.getenv("BOOKING_JOBS_DB", ".cache/booking_jobs.db"),
+    workers=int(os.getenv("BOOKING_JOB_WORKERS", 4)),
+    max_attempts=int(os.getenv("BOOKING_JOB_ATTEMPTS", 3)),
+)
+prefetcher = Prefetcher(max_workers=int(os.getenv("PREFETCH_WORKERS", 4)))
+# Separate pool so a wide price search doesn't queue ahead of dining/experiences prefetches
+calendar_prefetcher = Prefetcher(max_workers=PRICING_FETCH_WORKERS)
+compaction_stats = CompactionStats()
+cart_store = CartStore(state_backend, ttl=SESSION_TTL)
+
+
+def get_thread_session(thread_id):
+    """
+    Per-thread conversation state (e.g. the booking's result_set_id).
+    """
+    if not thread_id:
+        return {}
+    return state_backend.get("session", thread_id, {})
+
+
+def update_thread_session(thread_id, **values):
+    if not thread_id:
+        return
+    session = get_thread_session(thread_id)
+    session.update(values)
+    state_backend.set("session", thread_id, session, ttl=SESSION_TTL)
+
+
+def booking_idempotency_key(thread_id, **booking):
+    return json.dumps([thread_id, booking], sort_keys=True, default=str)
+
 
 # =============================
 # Four Seasons API Wrappers
@@ -67,7 +159,13 @@ def confirm_booking_if_available(start_date, end_date, property_name=None, perso
     )
     
     print(f"🔍 DEBUG: post_result_set returned: {result}")
-    
+    return booking_confirmation(result, property_name, start_date, end_date, persons)
+
+
+def booking_confirmation(result, property_name, start_date, end_date, persons):
+    """
+    confirm_booking_if_available's tool output for a post_result_set result.
+    """
     # Check if the booking service returned an error
     if isinstance(result, dict) and result.get("status") == "error":
         print(f"❌ Booking failed: {result.get('message', 'Unknown error')}")
@@ -105,32 +203,9 @@ def confirm_booking_if_available(start_date, end_date, property_name=None, perso
 
 def post_result_set(start_date, end_date, property_name=None, persons=None, room_type=None, price=None, destination=None):
     # Validate dates before proceeding
-    try:
-        start_date_obj = date.fromisoformat(str(start_date))
-        end_date_obj = date.fromisoformat(str(end_date))
-        today_obj = date.today()
-
-        if start_date_obj < today_obj:
-            return {
-                "status": "error",
-                "message": f"❌ Start date {start_date} is in the past. Please choose a date on or after {today_obj.isoformat()}.",
-                "next_action": "ask_new_dates",
-                "earliest_date": today_obj.isoformat(),
-            }
-        if end_date_obj <= start_date_obj:
-            return {
-                "status": "error",
-                "message": f"❌ End date {end_date} must be after start date {start_date}.",
-                "next_action": "ask_new_dates",
-                "earliest_date": today_obj.isoformat(),
-            }
-    except Exception:
-        return {
-            "status": "error",
-            "message": "❌ Invalid date format. Please use YYYY-MM-DD for start_date and end_date.",
-            "next_action": "ask_new_dates",
-            "earliest_date": date.today().isoformat(),
-        }
+    start_date, end_date, error = validate_stay(start_date, end_date)
+    if error:
+        return error
     # Handle both property_name and destination parameters
     if destination and not property_name:
         property_name = destination
@@ -273,7 +348,9 @@ def checkout_result_set(result_set_id):
         return {
             "status": "error",
             "message": "Booking service is currently unavailable. Please try again later.",
-            "error": "Connection refused - booking service not running"
+            "error": "Connection refused - booking service not running",
+            # The request never reached the booking service, so it is safe to repeat
+            "retryable": True,
         }
     except requests.exceptions.RequestException as e:
         print(f"❌ Booking service error: {e}")
@@ -291,62 +368,89 @@ def checkout_result_set(result_set_id):
         }
 
 
+def get_property_feed(owsCode, category, refresh=False):
+    """
+    Fetch a property's dining or experiences feed as a ProductFeed, served from cache
+    unless refresh=True. Falls back to the last known feed if the upstream is unreachable.
+    """
+    key = (category, owsCode)
+    if not refresh:
+        cached = feed_cache.get(key)
+        if cached is not None:
+            feed_hits[owsCode] += 1
+            return cached
+    url = FEED_URL.format(language=FEED_LANGUAGE, owsCode=owsCode, category=category, currency=FEED_CURRENCY)
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        result = parse_product_feed(response.json(), owsCode, category)
+    except requests.exceptions.RequestException as e:
+        if key not in last_known_feeds:
+            raise
+        print(f"⚠️ {category} feed unavailable for {owsCode}, serving last known data: {e}")
+        result = last_known_feeds[key]
+    else:
+        last_known_feeds[key] = result
+    feed_cache.set(key, result)
+    if not refresh:
+        feed_hits[owsCode] += 1
+    return result
+
+
+def get_feed_texts(owsCode, category, language):
+    """
+    Localized product names, descriptions and links for a feed, fetched once
+    per language and shared across currencies. None if unavailable.
+    """
+    key = (category, owsCode, language)
+    cached = feed_text_cache.get(key)
+    if cached is not None:
+        return cached
+    url = FEED_URL.format(language=language, owsCode=owsCode, category=category, currency=FEED_CURRENCY)
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        texts = parse_product_feed(response.json(), owsCode, category).texts()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️ {category} feed for {owsCode} unavailable in '{language}', using {FEED_LANGUAGE}: {e}")
+        return None
+    feed_text_cache.set(key, texts)
+    return texts
+
+
+def render_product_feed(feed, currency=None, language=None):
+    """
+    Tool output for a ProductFeed in the guest's currency and language.
+    Unsupported values fall back to the feed's own.
+    """
+    currency = currency.strip().upper() if isinstance(currency, str) and re.fullmatch(r"\s*[A-Za-z]{3}\s*", currency) else None
+    language = language.strip().lower() if isinstance(language, str) and re.fullmatch(r"\s*[A-Za-z]{2}(-[A-Za-z]{2})?\s*", language) else None
+    texts = None
+    if language and language != FEED_LANGUAGE and feed.raw is None:
+        texts = get_feed_texts(feed.owsCode, feed.category, language)
+    return feed.to_output(currency=currency, convert=fx_table.convert, texts=texts)
+
+
 def get_property_dining(owsCode):
-    url = f"https://www.fourseasons.com/alt/apps/fshr/feeds/product/availability?language=en&owsCode={owsCode}&categoryId=dining&currencyCode=INR&sourceName=Web+-+Shopping&timestamp=29190705&version=4"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return get_property_feed(owsCode, "dining")
 
 
 def get_property_experiences(owsCode):
-    url = f"https://www.fourseasons.com/alt/apps/fshr/feeds/product/availability?language=en&owsCode={owsCode}&categoryId=experiences&currencyCode=INR&sourceName=Web+-+Shopping&timestamp=29190705&version=4"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return get_property_feed(owsCode, "experiences")
 
 
 def check_availability(owsCode, start_date, end_date):
     # Validate dates before checking availability
-    try:
-        start_date_obj = date.fromisoformat(str(start_date))
-        end_date_obj = date.fromisoformat(str(end_date))
-        today_obj = date.today()
-
-        if start_date_obj < today_obj:
-            return {
-                "status": "error",
-                "owsCode": owsCode,
-                "start_date": start_date,
-                "end_date": end_date,
-                "message": f"❌ Start date {start_date} is in the past. Please choose a date on or after {today_obj.isoformat()}.",
-                "next_action": "ask_new_dates",
-                "earliest_date": today_obj.isoformat(),
-            }
-        if end_date_obj <= start_date_obj:
-            return {
-                "status": "error",
-                "owsCode": owsCode,
-                "start_date": start_date,
-                "end_date": end_date,
-                "message": f"❌ End date {end_date} must be after start date {start_date}.",
-                "next_action": "ask_new_dates",
-                "earliest_date": today_obj.isoformat(),
-            }
-    except Exception:
-        return {
-            "status": "error",
-            "owsCode": owsCode,
-            "start_date": start_date,
-            "end_date": end_date,
-            "message": "❌ Invalid date format. Please use YYYY-MM-DD for start_date and end_date.",
-            "next_action": "ask_new_dates",
-            "earliest_date": date.today().isoformat(),
-        }
+    valid_start, valid_end, error = validate_stay(start_date, end_date)
+    if error:
+        return {**error, "owsCode": owsCode, "start_date": start_date, "end_date": end_date}
+    start_date, end_date = valid_start, valid_end
     url = f"https://reservations.fourseasons.com/tretail/calendar/availability?propertySelection=SINGLE&hotelCityCode={owsCode}"
     
     try:
         response = requests.get(url, timeout=10)
         response.raise_for_status()
+        store_property_calendar(owsCode, response)
         return {
             "status": "available",
             "owsCode": owsCode,
@@ -379,6 +483,134 @@ def check_availability(owsCode, start_date, end_date):
         }
 
 
+def store_property_calendar(owsCode, response):
+    """
+    Cache the nightly rates from a calendar availability response as a RateRow.
+    """
+    try:
+        rates = parse_calendar(response.json())
+    except ValueError as e:
+        print(f"⚠️ Calendar for {owsCode} is not valid JSON: {e}")
+        return None
+    row = RateRow.from_rates(rates)
+    calendar_cache.set(owsCode, row)
+    return row
+
+
+def get_property_calendar(owsCode):
+    cached = calendar_cache.get(owsCode)
+    if cached is not None:
+        return cached
+    url = f"https://reservations.fourseasons.com/tretail/calendar/availability?propertySelection=SINGLE&hotelCityCode={owsCode}"
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return store_property_calendar(owsCode, response)
+
+
+def load_rate_table(owsCodes, start=None, days=365, max_fetch=None):
+    """
+    Build a RateTable from cached calendars, fetching at most `max_fetch`
+    uncached ones concurrently (all if None). The remaining calendars are
+    fetched in the background. Returns (table, owsCodes still loading);
+    properties whose calendar cannot be fetched are left out.
+    """
+    def fetch(owsCode):
+        try:
+            return owsCode, get_property_calendar(owsCode)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Calendar unavailable for {owsCode}: {e}")
+            return owsCode, None
+
+    rows = {}
+    cold = []
+    for owsCode in owsCodes:
+        row = calendar_cache.get(owsCode)
+        if row is not None:
+            rows[owsCode] = row
+        else:
+            cold.append(owsCode)
+    deferred = cold[max_fetch:] if max_fetch is not None else []
+    cold = cold[:max_fetch] if max_fetch is not None else cold
+    if cold:
+        with ThreadPoolExecutor(max_workers=PRICING_FETCH_WORKERS) as executor:
+            rows.update((owsCode, row) for owsCode, row in executor.map(fetch, cold) if row)
+    for owsCode in deferred:
+        calendar_prefetcher.prefetch(("calendar", owsCode), get_property_calendar, owsCode)
+    rows = {owsCode: rows[owsCode] for owsCode in owsCodes if owsCode in rows}
+    return RateTable.from_rows(rows, start=start, days=days), deferred
+
+
+def find_cheapest_stay(nights, start_date=None, end_date=None, location=None, owsCodes=None, limit=5):
+    """
+    Cheapest `nights`-night stays between start_date and end_date across the
+    properties matching `location` (name or region) or the given owsCodes.
+    """
+    try:
+        nights = int(nights)
+        date_from = date.fromisoformat(str(start_date)) if start_date else date.today()
+        date_to = date.fromisoformat(str(end_date)) if end_date else None
+    except (TypeError, ValueError):
+        return {
+            "status": "error",
+            "message": "❌ Invalid search. Please use a whole number of nights and YYYY-MM-DD dates.",
+        }
+    date_from = max(date_from, date.today())
+
+    properties = fetch_all_properties()
+    if owsCodes:
+        wanted = {code.upper() for code in owsCodes}
+        properties = [p for p in properties if p.owsCode.upper() in wanted]
+    elif location:
+        needle = location.strip().lower()
+        properties = [p for p in properties if needle in p.name.lower() or needle in p.region.lower()]
+    if not properties:
+        return {
+            "status": "error",
+            "message": f"❌ No properties found matching {location or owsCodes}.",
+        }
+    properties = properties[:PRICING_MAX_PROPERTIES]
+
+    table, loading = load_rate_table([p.owsCode for p in properties], start=date_from, max_fetch=PRICING_MAX_COLD_FETCHES)
+    coverage = {}
+    if loading:
+        coverage = {
+            "properties_loading": len(loading),
+            "coverage_note": f"Rates for {len(loading)} more properties are still loading; searching again shortly will compare them too.",
+        }
+    options = table.cheapest_windows(nights, date_from=date_from, date_to=date_to, limit=int(limit))
+    if not options:
+        return {
+            "status": "unavailable",
+            "message": f"No {nights}-night stays with published rates were found for those dates.",
+            **coverage,
+        }
+    names = {p.owsCode: p.name for p in properties}
+    for option in options:
+        option["property_name"] = names.get(option["owsCode"])
+    return {
+        "status": "success",
+        "properties_compared": len(table.owsCodes),
+        **coverage,
+        "options": options,
+        "next_action": "prompt_check_availability",
+    }
+
+
+def quote_stay_price(owsCode, start_date, end_date):
+    """
+    Total rate for a stay from the cached calendar, or None if not known.
+    """
+    row = calendar_cache.get(owsCode) if owsCode else None
+    if not row:
+        return None
+    try:
+        start = date.fromisoformat(str(start_date))
+        end = date.fromisoformat(str(end_date))
+    except ValueError:
+        return None
+    return row.stay_price(start, end)
+
+
 def get_fourseasons_properties():
     url = "https://reservations.fourseasons.com/content/en/properties"
     response = requests.get(url)
@@ -399,23 +631,63 @@ def get_fourseasons_properties():
 #     return response.json()
 
 
-def fetch_all_properties():
-    data = get_fourseasons_properties()
-    regions = data.get("regions", [])
-    all_properties = []
-    for region in regions:
-        for property in region.get("properties", []):
-            all_properties.append(
-                {
-                    "name": property["name"],
-                    "owsCode": property["owsCode"],
-                    "tripteaseAPIKey": property.get("tripteaseAPIKey"),
-                    "region": region["title"],
-                }
-            )
+def fetch_all_properties(refresh=False):
+    global last_known_catalog
+    if not refresh:
+        cached = catalog_cache.get("properties")
+        if cached is not None:
+            return cached
+    try:
+        data = get_fourseasons_properties()
+    except requests.exceptions.RequestException as e:
+        # Keep serving the snapshot / previous catalog through an upstream outage
+        if last_known_catalog is None:
+            raise
+        print(f"⚠️ Property catalog unavailable, serving last known catalog: {e}")
+        catalog_cache.set("properties", last_known_catalog)
+        return last_known_catalog
+    all_properties = catalog_from_regions(data)
+    last_known_catalog = all_properties
+    catalog_cache.set("properties", all_properties)
     return all_properties
 
 
+def normalize_stay_args(args):
+    """
+    Rewrite natural start/end dates in tool arguments ("Dec 20") as ISO so
+    quotes, idempotency keys and the session all see the same stay. Invalid
+    dates are left for the booking call to reject.
+    """
+    start_date, end_date, error = validate_stay(args.get("start_date"), args.get("end_date"))
+    if not error:
+        args["start_date"], args["end_date"] = start_date, end_date
+    return args
+
+
+def find_property(name_or_code):
+    """
+    Look up a catalog entry by owsCode or property name.
+    """
+    if not name_or_code:
+        return None
+    needle = str(name_or_code).strip().lower()
+    for prop in fetch_all_properties():
+        if prop.owsCode.lower() == needle or prop.name.lower() == needle:
+            return prop
+    return None
+
+
+def prefetch_property_feeds(owsCode):
+    """
+    Start dining and experience fetches for a property the guest is about to
+    book; the assistant is instructed to request both right after booking.
+    """
+    if not owsCode:
+        return
+    prefetcher.prefetch(("dining", owsCode), get_property_dining, owsCode)
+    prefetcher.prefetch(("experiences", owsCode), get_property_experiences, owsCode)
+
+
 def parse_complex_request(user_input: str):
     """
     Intelligently parse complex multi-part requests and break them down into steps.
@@ -437,6 +709,7 @@ def parse_complex_request(user_input: str):
         r"(\d+)\s+(\w+)\s+to\s+(\d+)\s+(\w+)",      # "20 Dec to 25 Dec"
         r"(\d+)\s+(\w+)\s*-\s*(\d+)\s+(\w+)",       # "20 Dec - 25 Dec"
         r"(\w+)\s+(\d+)\s+to\s+(\w+)\s+(\d+)",      # "Dec 20 to Dec 25"
+        r"(\w+\s+\d+)\s*(?:-|to)\s*(\d+)\b",          # "Dec 20-25", "from Dec 20 to 25"
     ]
     
     for pattern in date_patterns:
@@ -449,6 +722,17 @@ def parse_complex_request(user_input: str):
                 request_plan["extracted_info"]["start_date"] = f"{match.group(1)} {match.group(2)}"
                 request_plan["extracted_info"]["end_date"] = f"{match.group(3)} {match.group(4)}"
             break
+
+    # Turn the fragments (or phrases like "next weekend") into ISO dates so the
+    # assistant can call check_availability without another round
+    resolved = resolve_stay(
+        request_plan["extracted_info"].get("start_date"),
+        request_plan["extracted_info"].get("end_date"),
+        user_input,
+        date.today(),
+    )
+    if resolved:
+        request_plan["extracted_info"]["start_date"], request_plan["extracted_info"]["end_date"] = resolved
     
     # Extract location with more patterns
     location_patterns = [
@@ -630,12 +914,26 @@ STEP 11: Provide comprehensive summary
 - Format dining and experiences with: Name, Description, Price, and CLICKABLE LINK using detailPageUrl
 - Use markdown formatting: [Experience Name](detailPageUrl) for clickable links
 
+🛒 CART RULES:
+- post_addons returns cart_delta with the changed lines and the new cart version; do NOT call get_cart_result_set after every add-on
+- To refresh a cart you already showed, call get_cart_result_set(result_set_id, since_version) and only describe the changes
+
+⏳ BOOKING JOB RULES:
+- post_result_set and checkout_result_set may return status "pending" with a job_id while the booking service works
+- Tell the guest the request is being processed, then call get_booking_status(job_id, wait_seconds=10) for the outcome
+- NEVER call post_result_set again for a pending booking
+
 🚨 CONTEXT AWARENESS RULES:
 - ALWAYS check if user is referring to an EXISTING booking before creating a new one
 - If user says "proceed to checkout", "review my booking", "show my cart", etc., use the EXISTING result_set_id
 - NEVER create duplicate bookings for the same request
 - Maintain conversation context and use the most recent result_set_id from the conversation
 
+💰 PRICE COMPARISON RULES:
+- For "cheapest", "best rate" or "compare prices" questions, call find_cheapest_stay(nights, start_date, end_date, location) once
+- It compares every matching property and check-in date in one call; do NOT call check_availability per property or per date
+- Show property name, dates, total price and average nightly rate for each option
+
 🚨 PROPERTY DISPLAY RULES:
 - When user asks to "show properties in [region]" or "show available properties", ALWAYS display the actual property list
 - Use the fetch_all_properties() data to show a beautiful, organized list of properties
@@ -667,18 +965,271 @@ After booking confirmation, automatically fetch and display dining and experienc
 - Format each dining option and experience with: Name, Description, Price, and CLICKABLE LINK using detailPageUrl
 - Use markdown formatting: [Experience Name](detailPageUrl) for clickable links
 - Include pricing information when available from the API response
+- If the guest asks for prices in another currency or writes in another language, pass `currency` (ISO code, e.g. "USD") and/or `language` (e.g. "fr") to get_property_dining and get_property_experiences; always show the currencyCode returned with each price
 - Present dining and experiences in organized sections with clear headings
 """
     
     return enhanced_prompt
 
 
+# =============================
+# Booking Jobs
+# =============================
+def run_booking_job(booking, thread_id=None, idempotency_key=None, owsCode=None):
+    result = post_result_set(**booking)
+    if isinstance(result, dict) and result.get("id"):
+        if idempotency_key:
+            state_backend.set("idempotency", idempotency_key, result, ttl=IDEMPOTENCY_TTL)
+        if cart_store.get(result["id"]) is None:
+            cart_store.start(result["id"], booking)
+    return result
+
+
+def record_booking(payload, result):
+    if result.get("id"):
+        update_thread_session(payload.get("thread_id"), result_set_id=result["id"])
+        if payload.get("owsCode"):
+            update_thread_session(payload.get("thread_id"), owsCode=payload["owsCode"])
+
+
+booking_jobs.register("post_result_set", run_booking_job, on_success=record_booking)
+booking_jobs.register("checkout_result_set", checkout_result_set)
+BOOKING_JOB_LABELS = {"post_result_set": "booking", "checkout_result_set": "checkout"}
+
+
+def booking_job_output(job):
+    """
+    Tool output for a booking job: the booking-service result once finished,
+    otherwise a pending status with the job id to poll.
+    """
+    if job is None:
+        return {"status": "error", "message": "❌ Unknown booking job id."}
+    if job["status"] == SUCCEEDED:
+        return {**job["result"], "job_id": job["job_id"]}
+    if job["status"] == FAILED:
+        result = job["result"] or {"message": job["error"]}
+        return {**result, "status": "error", "job_id": job["job_id"]}
+    return {
+        "status": "pending",
+        "job_id": job["job_id"],
+        "message": f"⏳ Your {BOOKING_JOB_LABELS.get(job['kind'], 'booking')} request is being processed by the booking service.",
+        "next_action": "get_booking_status",
+    }
+
+
+def existing_job_output(idempotency_key, busy_message):
+    """
+    Claim idempotency_key for a new booking-service job. Returns None if the
+    caller should submit one, otherwise the output of the earlier booking or job.
+    """
+    if state_backend.add("idempotency", idempotency_key, {"status": "in_progress"}, ttl=IDEMPOTENCY_TTL):
+        return None
+    previous = state_backend.get("idempotency", idempotency_key, {})
+    if previous.get("id"):
+        print(f"🔁 DEBUG: Reusing existing booking {previous.get('id')} for duplicate request")
+        return previous
+    job = booking_jobs.get(previous["job_id"]) if previous.get("job_id") else None
+    # A job interrupted mid-call may have booked; don't let a retry book twice
+    if job is None or job["status"] != FAILED or (job["result"] or {}).get("outcome_unknown"):
+        return booking_job_output(job) if job else {
+            "status": "error",
+            "message": busy_message,
+            "next_action": "get_cart_result_set",
+        }
+    # The earlier attempt failed for good; let this request try again
+    return None
+
+
+def submit_claimed_job(idempotency_key, kind, payload):
+    """
+    Queue a booking-service job for a key claimed by existing_job_output and
+    wait briefly for it. If the job can't be queued the key is released, so
+    retries aren't told it is in progress until IDEMPOTENCY_TTL runs out.
+    """
+    try:
+        job_id = booking_jobs.submit(kind, payload)
+        state_backend.set("idempotency", idempotency_key, {"status": "in_progress", "job_id": job_id}, ttl=IDEMPOTENCY_TTL)
+    except Exception:
+        state_backend.delete("idempotency", idempotency_key)
+        raise
+    return booking_job_output(booking_jobs.wait(job_id, BOOKING_INLINE_WAIT))
+
+
+def submit_booking(thread_id, booking, owsCode=None):
+    """
+    Queue a post_result_set call, deduplicated per thread and booking, and wait
+    briefly for it. Returns the booking result or a pending job status.
+    """
+    # The same booking on the same thread (e.g. a retried request on
+    # another worker) must not create a second result set
+    idempotency_key = booking_idempotency_key(thread_id, **booking)
+    previous = existing_job_output(
+        idempotency_key,
+        "This booking is already being processed. Please check the cart shortly instead of booking again.",
+    )
+    if previous is not None:
+        return previous
+    return submit_claimed_job(idempotency_key, "post_result_set", {
+        "booking": booking,
+        "thread_id": thread_id,
+        "idempotency_key": idempotency_key,
+        "owsCode": owsCode,
+    })
+
+
+def load_cart(result_set_id):
+    """
+    Cart for a booking from the local model; the booking service is only
+    asked when there is no local cart yet.
+    """
+    cart = cart_store.get(result_set_id)
+    if cart is None:
+        remote_cart = get_cart_result_set(result_set_id)
+        cart = cart_store.reconcile(result_set_id, remote_cart)
+        if cart is None:
+            return remote_cart
+    return CartStore.as_payload(cart)
+
+
+def submit_checkout(result_set_id):
+    # Checkout is the one point where the local cart is always re-synced;
+    # done before claiming the key so a failure here leaves nothing behind
+    cart_store.reconcile(result_set_id, get_cart_result_set(result_set_id))
+    # One checkout per result set: a repeated "checkout" gets the pending or finished job
+    idempotency_key = json.dumps(["checkout", result_set_id])
+    previous = existing_job_output(
+        idempotency_key,
+        "This checkout is already being processed. Please check its status shortly instead of checking out again.",
+    )
+    if previous is not None:
+        return previous
+    return submit_claimed_job(idempotency_key, "checkout_result_set", {"result_set_id": result_set_id})
+
+
+# =============================
+# Thread Compaction
+# =============================
+def resolve_thread(session_id):
+    """
+    OpenAI thread currently backing the client's threadid (they differ after compaction).
+    """
+    return get_thread_session(session_id).get("openai_thread_id", session_id)
+
+
+def record_thread_usage(session_id, tokens, messages, response=None):
+    session = get_thread_session(session_id)
+    values = {
+        "thread_tokens": session.get("thread_tokens", 0) + tokens,
+        "thread_messages": session.get("thread_messages", 0) + messages,
+    }
+    if response:
+        values["last_response"] = response[:1500]
+    update_thread_session(session_id, **values)
+
+
+def compact_thread_if_needed(session_id, thread_id):
+    """
+    Start a fresh thread seeded with a summary of the session once the current
+    one is too long. Returns the thread to use for this turn.
+    """
+    session = get_thread_session(session_id)
+    if not should_compact(session, COMPACT_MAX_TOKENS, COMPACT_MAX_MESSAGES):
+        return thread_id
+
+    try:
+        prop = find_property(session.get("owsCode")) if session.get("owsCode") else None
+        cart = None
+        if session.get("result_set_id"):
+            cart = load_cart(session["result_set_id"])
+            if isinstance(cart, dict) and cart.get("status") == "error":
+                cart = None
+        summary = build_summary(
+            session,
+            property_name=prop.name if prop else None,
+            cart=json.dumps(cart) if cart else None,
+            last_response=session.get("last_response"),
+        )
+        thread = openai.beta.threads.create(messages=[{"role": "user", "content": summary}])
+    except Exception as e:
+        print(f"⚠️ Thread compaction failed for {session_id}, keeping {thread_id}: {e}")
+        return thread_id
+
+    compaction_stats.record_compaction(session)
+    update_thread_session(
+        session_id,
+        openai_thread_id=thread.id,
+        compacted_from=thread_id,
+        thread_tokens=estimate_tokens(summary),
+        thread_messages=1,
+        turns_since_compaction=0,
+    )
+    print(f"🗜️ DEBUG: Compacted thread {thread_id} ({session.get('thread_tokens', 0)} tokens, {session.get('thread_messages', 0)} messages) into {thread.id}")
+    return thread.id
+
+
+def handle_routed_intent(intent: str, user_input: str, session_id: str, thread_id: str):
+    """
+    Answer a high-confidence intent by calling the wrapper directly, without an
+    assistant run. Returns None when the turn must fall back to the assistant.
+    """
+    result_set_id = get_thread_session(session_id).get("result_set_id")
+    if not result_set_id:
+        intent_router.record_fallback(intent, "no_result_set_id")
+        return None
+
+    start = time.perf_counter()
+    if intent == "view_cart":
+        response = render_cart(load_cart(result_set_id), result_set_id)
+    elif intent == "checkout":
+        response = render_checkout(submit_checkout(result_set_id), result_set_id)
+    else:
+        intent_router.record_fallback(intent, "no_handler")
+        return None
+
+    # Keep the thread in sync so later assistant turns see this exchange
+    try:
+        openai.beta.threads.messages.create(
+            thread_id=thread_id, role="user", content=user_input
+        )
+        openai.beta.threads.messages.create(
+            thread_id=thread_id, role="assistant", content=response
+        )
+    except Exception as e:
+        print(f"⚠️ Failed to append routed response to thread {thread_id}: {e}")
+    record_thread_usage(session_id, estimate_tokens(user_input) + estimate_tokens(response), 2, response)
+
+    intent_router.record_hit(intent, time.perf_counter() - start)
+    print(f"⚡ DEBUG: Routed '{intent}' locally for result_set_id {result_set_id}")
+    return {
+        "thread_id": session_id,
+        "response": response,
+    }
+
+
 def run_assistant(user_input: str, thread_id: str = None):
     print("Welcome to the FourSeasons Assistant Booking CLI")
     print(user_input)
     print(thread_id)
+    turn_start = time.perf_counter()
+
+    # The client keeps sending its original threadid; after compaction it maps
+    # to a newer OpenAI thread. Session state stays keyed by the client's id.
+    session_id = thread_id
+    if session_id:
+        mark("resolve_thread")
+        thread_id = resolve_thread(session_id)
+
+    # Simple lookups like "show my cart" or "checkout" skip the assistant entirely
+    if session_id:
+        mark("intent_router")
+        routed_intent = intent_router.route(user_input)
+        if routed_intent:
+            routed = handle_routed_intent(routed_intent, user_input, session_id, thread_id)
+            if routed:
+                return routed
     
     # Parse complex request and create comprehensive execution plan
+    mark("parse_complex_request")
     request_plan = parse_complex_request(user_input)
     print(f"🔍 DEBUG: Request plan created: {request_plan}")
     
@@ -717,17 +1268,62 @@ def run_assistant(user_input: str, thread_id: str = None):
         enhanced_input = user_input
         print(f"🔍 DEBUG: Simple request - using original input")
 
+    extracted_info = request_plan["extracted_info"]
+    if extracted_info.get("start_date") and extracted_info.get("end_date") and len(request_plan["steps"]) <= 1:
+        try:
+            date.fromisoformat(extracted_info["start_date"])
+            date.fromisoformat(extracted_info["end_date"])
+        except ValueError:
+            pass
+        else:
+            enhanced_input += (
+                f"\n\n(Guest's dates resolved: start_date={extracted_info['start_date']}, "
+                f"end_date={extracted_info['end_date']}. Use these for tool calls.)"
+            )
+
     try:
         if not thread_id:
+            mark("openai.create_thread")
             thread = openai.beta.threads.create()
-            thread_id = thread.id
+            thread_id = session_id = thread.id
     except Exception as e:
         print(f"❌ Failed to create thread: {e}")
         return {
-            "thread_id": thread_id,
+            "thread_id": session_id,
             "response": f"❌ Error during assistant interaction: {e}",
         }
 
+    # Informational answers that are identical for every guest can be served
+    # from cache; the exchange is still written to the thread for context.
+    mark("response_cache")
+    cache_entry = response_cache.key_for(user_input, request_plan)
+    if cache_entry:
+        cache_key, cache_ttl = cache_entry
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            print(f"⚡ DEBUG: Response cache hit for {cache_key}")
+            thread_id = compact_thread_if_needed(session_id, thread_id)
+            try:
+                openai.beta.threads.messages.create(
+                    thread_id=thread_id, role="user", content=user_input
+                )
+                openai.beta.threads.messages.create(
+                    thread_id=thread_id, role="assistant", content=cached_response
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to append cached response to thread {thread_id}: {e}")
+            record_thread_usage(session_id, estimate_tokens(user_input) + estimate_tokens(cached_response), 2, cached_response)
+            return {
+                "thread_id": session_id,
+                "response": cached_response,
+            }
+
+    mark("compaction")
+    thread_id = compact_thread_if_needed(session_id, thread_id)
+    # Rough size of what this turn adds to the thread, for compaction
+    turn_tokens = estimate_tokens(enhanced_input)
+
+    mark("openai.create_messages")
     today = date.today().isoformat()
     date_message = openai.beta.threads.messages.create(
         thread_id=thread_id, role="user", content=f"Remember current date: {today}"
@@ -738,19 +1334,27 @@ def run_assistant(user_input: str, thread_id: str = None):
             thread_id=thread_id, role="user", content=enhanced_input
         )
 
+        mark("openai.create_and_poll")
         run = openai.beta.threads.runs.create_and_poll(
             thread_id=thread_id, assistant_id=ASSISTANT_ID
         )
 
         # Track the actual result_set_id for validation - ALWAYS declare this at function level
-        actual_result_set_id = None
+        actual_result_set_id = get_thread_session(session_id).get("result_set_id")
+        # Remaining lifetime of the cached upstream data the answer is built from
+        source_ttls = []
+        # Answers built on a failed tool call ("dining is unavailable") aren't cached
+        turn_cacheable = True
+        run_completed = False
         
         while True:
+            mark("openai.retrieve_run")
             run_status = openai.beta.threads.runs.retrieve(
                 thread_id=thread_id, run_id=run.id
             )
 
             if run_status.status == "completed":
+                run_completed = True
                 break
             elif run_status.status == "requires_action":
                 tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
@@ -761,16 +1365,27 @@ def run_assistant(user_input: str, thread_id: str = None):
 
                 for call in tool_calls:
                     name = call.function.name
+                    mark(f"tool.{name}")
                     args = json.loads(call.function.arguments)
                     print(f"Tool Calling: {name} with arguments: {args}")
 
+                    result = None
                     try:
                         if name == "check_availability":
+                            normalize_stay_args(args)
                             result = check_availability(
                                 owsCode=args["owsCode"],
                                 start_date=args["start_date"],
                                 end_date=args["end_date"],
                             )
+                            if result.get("status") == "available":
+                                prefetch_property_feeds(args["owsCode"])
+                                update_thread_session(
+                                    session_id,
+                                    owsCode=args["owsCode"],
+                                    start_date=args["start_date"],
+                                    end_date=args["end_date"],
+                                )
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
@@ -779,7 +1394,8 @@ def run_assistant(user_input: str, thread_id: str = None):
                             )
 
                         elif name == "get_fourseasons_properties":
-                            result = fetch_all_properties()
+                            result = [prop.to_dict() for prop in fetch_all_properties()]
+                            source_ttls.append(catalog_cache.ttl_remaining("properties"))
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
@@ -788,14 +1404,41 @@ def run_assistant(user_input: str, thread_id: str = None):
                             )
 
                         elif name == "confirm_booking_if_available":
-                            result = confirm_booking_if_available(
+                            property_name = args.get("property_name") or args.get("destination")
+                            if not property_name:
+                                raise ValueError("Either property_name or destination must be provided")
+                            normalize_stay_args(args)
+                            prop = find_property(property_name)
+                            booked_owsCode = prop.owsCode if prop else None
+                            price = args.get("price")
+                            if price is None:
+                                price = quote_stay_price(booked_owsCode, args["start_date"], args["end_date"]) or 15000.0
+                            booking = dict(
                                 start_date=args["start_date"],
                                 end_date=args["end_date"],
-                                property_name=args.get("property_name") or args.get("destination"),
-                                persons=args.get("persons", 2),
-                                room_type=args.get("room_type", "STD"),
-                                price=args.get("price", 15000.0)
+                                property_name=property_name,
+                                persons=args.get("persons") or 2,
+                                room_type=args.get("room_type") or "STD",
+                                price=price
                             )
+                            # Same queued, deduplicated path as post_result_set
+                            result = submit_booking(session_id, booking, owsCode=booked_owsCode)
+                            if result.get("status") != "pending":
+                                job_id = result.get("job_id")
+                                result = booking_confirmation(result, property_name, booking["start_date"], booking["end_date"], booking["persons"])
+                                if job_id:
+                                    result["job_id"] = job_id
+                            if result.get("status") == "success":
+                                actual_result_set_id = result.get("result_set_id")
+                                update_thread_session(
+                                    session_id,
+                                    result_set_id=actual_result_set_id,
+                                    start_date=booking["start_date"],
+                                    end_date=booking["end_date"],
+                                    persons=booking["persons"],
+                                )
+                                if booked_owsCode:
+                                    update_thread_session(session_id, owsCode=booked_owsCode)
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
@@ -806,32 +1449,50 @@ def run_assistant(user_input: str, thread_id: str = None):
                         elif name == "post_result_set":
                             # Validate booking parameters before proceeding
                             destination = args.get("property_name") or args.get("destination")
+                            booked_owsCode = None
                             if destination:  
                                 print(f"⚠️ WARNING: AI provided owsCode '{destination}' as destination. This should be a property name.")
                                 # Try to find the property name from the owsCode
                                 try:
-                                    properties = fetch_all_properties()
-                                    for prop in properties:
-                                        if prop.get("owsCode") == destination:
-                                            destination = prop.get("name", "Unknown Property")
+                                    prop = find_property(destination)
+                                    if prop:
+                                        booked_owsCode = prop.owsCode
+                                        if prop.owsCode == destination:
+                                            destination = prop.name
                                             print(f"🔧 DEBUG: Corrected destination to: {destination}")
-                                            break
                                 except:
                                     destination = "Four Seasons Property"
                                     print(f"🔧 DEBUG: Using fallback destination: {destination}")
+                            # Dining and experiences are requested right after booking
+                            prefetch_property_feeds(booked_owsCode)
                             
-                            result = post_result_set(
+                            # Prefer the published rate for these dates over the flat default
+                            normalize_stay_args(args)
+                            price = args.get("price")
+                            if price is None:
+                                price = quote_stay_price(booked_owsCode, args["start_date"], args["end_date"]) or 15000.0
+                            booking = dict(
                                 start_date=args["start_date"],
                                 end_date=args["end_date"],
                                 property_name=destination,
                                 persons=args.get("persons", 2),
                                 room_type=args.get("room_type", "STD"),
-                                price=args.get("price", 15000.0)
+                                price=price
                             )
+                            result = submit_booking(session_id, booking, owsCode=booked_owsCode)
                             
                             # Track the actual result_set_id for validation
                             if isinstance(result, dict) and result.get("id"):
                                 actual_result_set_id = result.get("id")
+                                update_thread_session(
+                                    session_id,
+                                    result_set_id=actual_result_set_id,
+                                    start_date=booking["start_date"],
+                                    end_date=booking["end_date"],
+                                    persons=booking["persons"],
+                                )
+                                if booked_owsCode:
+                                    update_thread_session(session_id, owsCode=booked_owsCode)
                                 print(f"🔍 DEBUG: Tracked result_set_id: {actual_result_set_id}")
                             
                             tool_outputs.append(
@@ -842,20 +1503,22 @@ def run_assistant(user_input: str, thread_id: str = None):
                             )
 
                         elif name == "get_property_dining":
-                            result = get_property_dining(owsCode=args["owsCode"])
+                            result = prefetcher.get(("dining", args["owsCode"]), get_property_dining, args["owsCode"])
+                            source_ttls.append(feed_cache.ttl_remaining(("dining", args["owsCode"])))
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
-                                    "output": json.dumps(result),
+                                    "output": json.dumps(render_product_feed(result, args.get("currency"), args.get("language"))),
                                 }
                             )
 
                         elif name == "get_property_experiences":
-                            result = get_property_experiences(owsCode=args["owsCode"])
+                            result = prefetcher.get(("experiences", args["owsCode"]), get_property_experiences, args["owsCode"])
+                            source_ttls.append(feed_cache.ttl_remaining(("experiences", args["owsCode"])))
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
-                                    "output": json.dumps(result),
+                                    "output": json.dumps(render_product_feed(result, args.get("currency"), args.get("language"))),
                                 }
                             )
 
@@ -875,13 +1538,20 @@ def run_assistant(user_input: str, thread_id: str = None):
                                 details=args["product_details"],
                             )
                             
-                            # After adding addon, automatically show cart contents for verification
+                            # Apply the add-on to the local cart and return only what changed
                             if isinstance(result, dict) and result.get("status") == "success":
-                                print(f"✅ Addon added successfully. Now showing cart contents...")
-                                cart_result = get_cart_result_set(args["result_set_id"])
-                                if isinstance(cart_result, dict) and cart_result.get("status") != "error":
-                                    result["cart_contents"] = cart_result
-                                    result["message"] += f"\n\n📋 Cart updated! Current cart contents: {cart_result}"
+                                cart, needs_reconcile = cart_store.record_addon(
+                                    args["result_set_id"], args["sku_id"], args["price"], args["product_details"], result
+                                )
+                                if needs_reconcile:
+                                    print(f"🔄 DEBUG: Cart version mismatch for {args['result_set_id']}, re-syncing with booking service")
+                                    base_version = cart["version"] - 1 if cart else 0
+                                    cart = cart_store.reconcile(args["result_set_id"], get_cart_result_set(args["result_set_id"]))
+                                else:
+                                    base_version = cart["version"] - 1
+                                if cart:
+                                    result["cart_delta"] = CartStore.changes_since(cart, base_version)
+                                    result["message"] = f"{result.get('message', '')}\n\n📋 Cart updated (version {cart['version']}).".strip()
                             
                             tool_outputs.append(
                                 {
@@ -891,9 +1561,24 @@ def run_assistant(user_input: str, thread_id: str = None):
                             )
 
                         elif name == "get_cart_result_set":
-                            result = get_cart_result_set(
-                                result_set_id=args["result_set_id"]
+                            since_version = args.get("since_version")
+                            cart = cart_store.get(args["result_set_id"]) if since_version is not None else None
+                            if cart:
+                                result = CartStore.changes_since(cart, int(since_version))
+                            else:
+                                result = load_cart(args["result_set_id"])
+                            tool_outputs.append(
+                                {
+                                    "tool_call_id": call.id,
+                                    "output": json.dumps(result),
+                                }
                             )
+
+                        elif name == "get_booking_status":
+                            wait_seconds = min(float(args.get("wait_seconds", 0)), 20)
+                            result = booking_job_output(booking_jobs.wait(args["job_id"], wait_seconds))
+                            if result.get("id") and result.get("status") != "error":
+                                actual_result_set_id = result["id"]
                             tool_outputs.append(
                                 {
                                     "tool_call_id": call.id,
@@ -901,9 +1586,14 @@ def run_assistant(user_input: str, thread_id: str = None):
                                 }
                             )
 
-                        elif name == "checkout_result_set":
-                            result = checkout_result_set(
-                                result_set_id=args["result_set_id"]
+                        elif name == "find_cheapest_stay":
+                            result = find_cheapest_stay(
+                                nights=args["nights"],
+                                start_date=args.get("start_date"),
+                                end_date=args.get("end_date"),
+                                location=args.get("location"),
+                                owsCodes=args.get("owsCodes"),
+                                limit=args.get("limit", 5),
                             )
                             tool_outputs.append(
                                 {
@@ -912,8 +1602,18 @@ def run_assistant(user_input: str, thread_id: str = None):
                                 }
                             )
 
+                        elif name == "checkout_result_set":
+                            result = submit_checkout(args["result_set_id"])
+                            tool_outputs.append(
+                                {
+                                    "tool_call_id": call.id,
+                                    "output": json.dumps(result),
+                                }
+                            )
+
                     except Exception as e:
                         print(f"❌ Tool {name} failed: {e}")
+                        turn_cacheable = False
                         tool_outputs.append(
                             {
                                 "tool_call_id": call.id,
@@ -922,7 +1622,12 @@ def run_assistant(user_input: str, thread_id: str = None):
                                 ),
                             }
                         )
+                    else:
+                        if isinstance(result, dict) and result.get("status") in ("error", "Unavailable"):
+                            turn_cacheable = False
 
+                turn_tokens += sum(estimate_tokens(output["output"]) for output in tool_outputs)
+                mark("openai.submit_tool_outputs")
                 openai.beta.threads.runs.submit_tool_outputs_and_poll(
                     thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
                 )
@@ -935,8 +1640,10 @@ def run_assistant(user_input: str, thread_id: str = None):
                 print(f"❌ Run failed with status: {run_status.status}")
                 break
 
+            mark("openai.poll_wait")
             time.sleep(1)
 
+        mark("openai.list_messages")
         messages = openai.beta.threads.messages.list(thread_id=thread_id)
         openai.beta.threads.messages.delete(
             message_id=date_message.id, thread_id=thread_id
@@ -944,13 +1651,21 @@ def run_assistant(user_input: str, thread_id: str = None):
         for msg in messages.data:
             if msg.role == "assistant":
                 print(f"\nAI: {msg.content[0].text.value}")
+                # Answers from a thread with its own booking context may use that guest's stay
+                if cache_entry and run_completed and turn_cacheable and ResponseCache.cacheable_session(get_thread_session(session_id)):
+                    response_cache.set(cache_key, msg.content[0].text.value, ttl=cache_ttl, source_ttls=source_ttls)
+                if run_completed:
+                    turn_seconds = time.perf_counter() - turn_start
+                    intent_router.record_llm_turn(turn_seconds)
+                    update_thread_session(session_id, **compaction_stats.record_turn(get_thread_session(session_id), turn_seconds))
+                record_thread_usage(session_id, turn_tokens + estimate_tokens(msg.content[0].text.value), 2, msg.content[0].text.value)
                 return {
-                    "thread_id": thread_id,
+                    "thread_id": session_id,
                     "response": msg.content[0].text.value,
                 }
 
         return {
-            "thread_id": thread_id,
+            "thread_id": session_id,
             "response": "⚠️ No assistant response found.",
         }
     except Exception as e:
@@ -962,7 +1677,7 @@ def run_assistant(user_input: str, thread_id: str = None):
             }
         )
         return {
-            "thread_id": thread_id,
+            "thread_id": session_id,
             "response": f"❌ Error during assistant interaction: {e}",
         }
 
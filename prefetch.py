@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """
+    Runs predictable upstream fetches speculatively in the background.
+    Results land in the wrapped function's own cache; while a fetch is still
+    in flight, callers join it instead of issuing a duplicate request.
+    """
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.failed = 0
+        self.joined = 0
+
+    def prefetch(self, key, fn, *args):
+        with self._lock:
+            if key in self._futures:
+                return
+            future = self._executor.submit(fn, *args)
+            self._futures[key] = future
+            self.started += 1
+        future.add_done_callback(lambda f: self._done(key, f))
+
+    def get(self, key, fn, *args, timeout=15):
+        """
+        Return fn(*args), joining an in-flight prefetch for the same key if any.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+        if future is not None:
+            try:
+                result = future.result(timeout=timeout)
+                with self._lock:
+                    self.joined += 1
+                return result
+            except Exception as e:
+                print(f"⚠️ Prefetch for {key} did not complete: {e}")
+        return fn(*args)
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+            if future.exception() is not None:
+                self.failed += 1
+                print(f"⚠️ Prefetch for {key} failed: {future.exception()}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._futures),
+                "started": self.started,
+                "failed": self.failed,
+                "joined": self.joined,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
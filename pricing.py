@@ -0,0 +1,182 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+DATE_KEYS = ("date", "day", "stayDate", "calendarDate")
+RATE_KEYS = ("rate", "price", "minRate", "lowestRate", "amount", "nightlyRate")
+
+
+def parse_calendar(payload):
+    """
+    Extract {date: nightly_rate} from a calendar availability payload.
+    Days marked unavailable or without a numeric rate are skipped.
+    """
+    rates = {}
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            day = next((node[k] for k in DATE_KEYS if isinstance(node.get(k), str)), None)
+            rate = next((node[k] for k in RATE_KEYS if node.get(k) is not None), None)
+            if isinstance(rate, dict):
+                rate = rate.get("amount") or rate.get("value")
+            if day and rate is not None:
+                if node.get("available") is False or str(node.get("status", "")).lower() in ("closed", "unavailable", "soldout", "sold_out"):
+                    continue
+                try:
+                    rates[date.fromisoformat(day[:10])] = float(rate)
+                except (TypeError, ValueError):
+                    continue
+            else:
+                stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+    return rates
+
+
+class RateRow:
+    """
+    One property's nightly rates as a float array of consecutive days from
+    `start` (NaN marks a night that cannot be booked). Kept in the calendar
+    cache so building a RateTable is a slice copy per property.
+    """
+
+    __slots__ = ("start", "rates")
+
+    def __init__(self, start: date, rates: np.ndarray):
+        self.start = start
+        self.rates = rates
+
+    @classmethod
+    def from_rates(cls, rates: dict):
+        """
+        Build a row from {date: rate}.
+        """
+        if not rates:
+            return cls(date.today(), np.empty(0))
+        start = min(rates)
+        row = np.full((max(rates) - start).days + 1, np.nan)
+        row[[(day - start).days for day in rates]] = list(rates.values())
+        return cls(start, row)
+
+    def __len__(self):
+        return len(self.rates)
+
+    def window(self, start: date, days: int) -> np.ndarray:
+        """
+        Rates for `days` nights from `start`, NaN outside the known range.
+        """
+        out = np.full(days, np.nan)
+        lo = (start - self.start).days
+        src_lo, src_hi = max(lo, 0), min(lo + days, len(self.rates))
+        if src_lo < src_hi:
+            out[src_lo - lo:src_hi - lo] = self.rates[src_lo:src_hi]
+        return out
+
+    def stay_price(self, start_date: date, end_date: date):
+        """
+        Total for a stay, or None if the dates are reversed or any night is unknown or unavailable.
+        """
+        if end_date <= start_date:
+            return None
+        nights = self.window(start_date, (end_date - start_date).days)
+        if np.isnan(nights).any():
+            return None
+        return round(float(nights.sum()), 2)
+
+    def encode(self):
+        return {"start": self.start.isoformat(), "rates": [None if np.isnan(r) else float(r) for r in self.rates]}
+
+    @classmethod
+    def decode(cls, packed):
+        return cls(date.fromisoformat(packed["start"]), np.array(packed["rates"], dtype=float))
+
+
+class RateTable:
+    """
+    Nightly rates for many properties held as a (property x day) float matrix;
+    NaN marks a night that cannot be booked.
+    """
+
+    def __init__(self, owsCodes, start: date, rates: np.ndarray):
+        self.owsCodes = list(owsCodes)
+        self.start = start
+        self.rates = rates
+        self._rows = {code: i for i, code in enumerate(self.owsCodes)}
+
+    @classmethod
+    def from_rows(cls, rows: dict, start: date = None, days: int = 365):
+        """
+        Build a table from {owsCode: RateRow} covering `days` nights from `start`.
+        """
+        start = start or date.today()
+        owsCodes = list(rows)
+        rates = np.full((len(owsCodes), days), np.nan)
+        for index, owsCode in enumerate(owsCodes):
+            rates[index] = rows[owsCode].window(start, days)
+        return cls(owsCodes, start, rates)
+
+    @property
+    def end(self):
+        return self.start + timedelta(days=self.rates.shape[1])
+
+    def _column(self, day: date):
+        return min(max((day - self.start).days, 0), self.rates.shape[1])
+
+    def window_totals(self, nights: int, rows=None, date_from: date = None, date_to: date = None):
+        """
+        Total price of every `nights`-night stay checking in between date_from and
+        date_to (check-out no later than date_to). Returns (totals, first_column)
+        where totals[p, w] is the stay for row p checking in at first_column + w,
+        with inf where any night is unavailable.
+        """
+        lo = self._column(date_from) if date_from else 0
+        hi = self._column(date_to) if date_to else self.rates.shape[1]
+        rates = self.rates[rows, lo:hi] if rows is not None else self.rates[:, lo:hi]
+        if nights <= 0 or rates.shape[1] < nights:
+            return np.empty((rates.shape[0], 0)), lo
+
+        available = ~np.isnan(rates)
+        zeros = np.zeros((rates.shape[0], 1))
+        price_sums = np.concatenate([zeros, np.cumsum(np.where(available, rates, 0.0), axis=1)], axis=1)
+        open_sums = np.concatenate([zeros, np.cumsum(available, axis=1)], axis=1)
+        totals = price_sums[:, nights:] - price_sums[:, :-nights]
+        bookable = (open_sums[:, nights:] - open_sums[:, :-nights]) == nights
+        return np.where(bookable, totals, np.inf), lo
+
+    def cheapest_windows(self, nights: int, owsCodes=None, date_from: date = None, date_to: date = None, limit: int = 5):
+        """
+        The `limit` cheapest `nights`-night stays across the given properties
+        (all properties if None), cheapest first.
+        """
+        rows = None
+        if owsCodes is not None:
+            rows = [self._rows[code] for code in owsCodes if code in self._rows]
+            if not rows:
+                return []
+        totals, first_column = self.window_totals(nights, rows, date_from, date_to)
+        if totals.size == 0:
+            return []
+
+        flat = totals.ravel()
+        limit = min(limit, int(np.isfinite(flat).sum()))
+        if limit <= 0:
+            return []
+        best = np.argpartition(flat, limit - 1)[:limit]
+        best = best[np.argsort(flat[best])]
+
+        row_codes = [self.owsCodes[r] for r in rows] if rows is not None else self.owsCodes
+        results = []
+        for index in best:
+            row, offset = divmod(int(index), totals.shape[1])
+            check_in = self.start + timedelta(days=first_column + offset)
+            total = float(flat[index])
+            results.append({
+                "owsCode": row_codes[row],
+                "start_date": check_in.isoformat(),
+                "end_date": (check_in + timedelta(days=nights)).isoformat(),
+                "nights": nights,
+                "total_price": round(total, 2),
+                "average_nightly_rate": round(total / nights, 2),
+            })
+        return results
@@ -0,0 +1,231 @@
+import os
+import sys
+import glob
+import hmac
+import json
+import time
+import uuid
+import random
+import threading
+
+# Requests are profiled when they send this header carrying the configured
+# token, or at random at PROFILE_SAMPLE_RATE
+PROFILE_HEADER = "X-Profile"
+PROFILE_SUFFIX = ".speedscope.json"
+
+_active = threading.local()
+
+
+def mark(name):
+    """
+    Start phase `name` on the current request's timeline, ending the previous
+    phase. A no-op (one thread-local lookup) unless the request is profiled.
+    """
+    profile = getattr(_active, "profile", None)
+    if profile is not None:
+        profile.mark(name)
+
+
+class RequestProfile:
+    """
+    Stack samples of one thread, taken every `interval` seconds from a
+    background thread via sys._current_frames(), plus a flat phase timeline.
+    """
+
+    def __init__(self, label, interval, started_at=None):
+        self.label = label
+        self.interval = interval
+        self.started_at = started_at
+        self.thread_id = None
+        self.start_time = None
+        self.end_time = None
+        self.samples = []
+        self.phases = []
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.start_time = time.perf_counter()
+        if self.started_at is not None and self.started_at < self.start_time:
+            # Time spent waiting for admission and a threadpool worker
+            self.phases.append(["queued", self.started_at, self.start_time])
+            self.start_time = self.started_at
+        self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self.end_time = time.perf_counter()
+        if self.phases and self.phases[-1][2] is None:
+            self.phases[-1][2] = self.end_time
+        self._stop.set()
+        self._sampler.join()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        if self.phases and self.phases[-1][2] is None:
+            self.phases[-1][2] = now
+        self.phases.append([name, now, None])
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            self.samples.append((now - last, tuple(reversed(stack))))
+            last = now
+
+    def to_speedscope(self):
+        """
+        The profile in speedscope's file format (https://www.speedscope.app):
+        a sampled CPU/wall profile and an evented profile of the phases.
+        """
+        frames = []
+        index = {}
+
+        def frame_id(key):
+            if key not in index:
+                index[key] = len(frames)
+                name, path, line = key
+                frames.append({"name": name, "file": path, "line": line} if path else {"name": name})
+            return index[key]
+
+        def ms(t):
+            return round(1000 * (t - self.start_time), 3)
+
+        sampled = {
+            "type": "sampled",
+            "name": f"{self.label} (stack samples)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": ms(self.end_time),
+            "samples": [[frame_id(key) for key in stack] for _, stack in self.samples],
+            "weights": [round(1000 * weight, 3) for weight, _ in self.samples],
+        }
+        events = []
+        for name, start, end in self.phases:
+            phase = frame_id((name, None, None))
+            events.append({"type": "O", "frame": phase, "at": ms(start)})
+            events.append({"type": "C", "frame": phase, "at": ms(end)})
+        evented = {
+            "type": "evented",
+            "name": f"{self.label} (phases)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": ms(self.end_time),
+            "events": events,
+        }
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.label,
+            "exporter": "fourseasons-profiler",
+            "shared": {"frames": frames},
+            "profiles": [sampled, evented],
+        }
+
+    def phase_totals(self):
+        totals = {}
+        for name, start, end in self.phases:
+            totals[name] = totals.get(name, 0) + end - start
+        return {name: round(1000 * seconds, 1) for name, seconds in totals.items()}
+
+
+class Profiler:
+    """
+    Opt-in per-request profiling. Unprofiled requests only pay for
+    should_profile(); profiled ones are written to `directory` as
+    speedscope JSON files.
+
+    The header only enables profiling when it carries `token` (no token
+    configured means header requests are ignored). At most `max_concurrent`
+    requests are profiled at once, and only the newest `max_files` profiles
+    are kept on disk.
+    """
+
+    def __init__(self, directory, sample_rate=0.0, interval=0.005, token=None, max_concurrent=1, max_files=50):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.token = token or None
+        self.max_files = max_files
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.skipped_busy = 0
+        self.write_errors = 0
+        self.last_file = None
+
+    def should_profile(self, header_value=None):
+        # Bytes, since compare_digest rejects non-ASCII str (headers arrive as latin-1)
+        if header_value is not None and self.token and hmac.compare_digest(header_value.strip().encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, label, fn, *args, started_at=None, **kwargs):
+        """
+        Call fn in the current thread under a profile. Returns (result, file
+        name); the name is None if the profile was skipped because enough
+        requests are already being profiled, or could not be written.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.skipped_busy += 1
+            return fn(*args, **kwargs), None
+        try:
+            profile = RequestProfile(label, self.interval, started_at=started_at)
+            _active.profile = profile
+            profile.start()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profile.stop()
+                _active.profile = None
+            return result, self.write(profile)
+        finally:
+            self._slots.release()
+
+    def write(self, profile):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{profile.label}-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(profile.to_speedscope(), f)
+            self._rotate()
+        except OSError as e:
+            with self._lock:
+                self.write_errors += 1
+            print(f"⚠️ Failed to write profile to {path}: {e}")
+            return None
+        with self._lock:
+            self.profiled += 1
+            self.last_file = name
+        print(f"🔬 Profile written to {path}: {profile.phase_totals()}")
+        return name
+
+    def _rotate(self):
+        # Keep the newest max_files profiles
+        files = sorted(glob.glob(os.path.join(self.directory, f"*{PROFILE_SUFFIX}")), key=os.path.getmtime)
+        for path in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "header_enabled": self.token is not None,
+                "profiled": self.profiled,
+                "skipped_busy": self.skipped_busy,
+                "write_errors": self.write_errors,
+                "last_file": self.last_file,
+            }
@@ -0,0 +1,133 @@
+import re
+import threading
+
+from cache import TTLCache, CATALOG_TTL, FEED_TTL
+
+# Anything that reads or changes a booking, a cart or a guest's own data must
+# always go through a real assistant run, as must anything asking for prices
+# in a particular currency.
+BYPASS_PATTERN = re.compile(
+    r"\b(book\w*|reserv\w*|cart|check\s*out|checkout|add|include|confirm\w*|cancel\w*|"
+    r"availab\w*|pay\w*|my|mine|our|price\w*|rate|rates|cost\w*|"
+    r"currenc\w*|dollars?|euros?|pounds?|yen|rupees?|usd|eur|gbp|inr)\b",
+    re.IGNORECASE,
+)
+
+# Words that parse_complex_request can pick up as a "location" without it
+# actually naming a place ("dining at the Maldives property" -> "the").
+NON_LOCATIONS = {
+    "the", "a", "an", "this", "that", "it", "is", "are", "me", "my", "our", "your",
+    "any", "all", "what", "which", "there", "here", "available", "options",
+}
+
+# A turn on a thread with any of these is likely to draw on that guest's own
+# stay, so its answer must not be cached for others
+SESSION_CONTEXT_KEYS = ("result_set_id", "owsCode", "start_date", "end_date")
+
+INFORMATIONAL_INTENTS = [
+    ("property_dining", re.compile(r"\b(dining|dinner|restaurants?|bars?|meals?|food)\b", re.IGNORECASE), FEED_TTL),
+    ("property_experiences", re.compile(r"\b(experiences?|activit\w+|spa|excursions?|things\s+to\s+do)\b", re.IGNORECASE), FEED_TTL),
+    ("list_properties", re.compile(r"\b(propert(y|ies)|hotels?|resorts?|destinations?)\b", re.IGNORECASE), CATALOG_TTL),
+]
+
+
+def classify_informational_intent(user_input: str, request_plan: dict):
+    """
+    Return (intent, ttl) for a purely informational request, or None if the
+    request must not be answered from cache.
+    """
+    if BYPASS_PATTERN.search(user_input):
+        return None
+
+    extracted_info = request_plan.get("extracted_info", {})
+    # Dates, guests or room types mean the guest is planning a stay
+    if any(extracted_info.get(key) for key in ("start_date", "end_date", "guests", "room_type")):
+        return None
+
+    for intent, pattern, ttl in INFORMATIONAL_INTENTS:
+        if pattern.search(user_input):
+            return intent, ttl
+    return None
+
+
+def normalize_question(user_input: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", user_input.lower()))
+
+
+def normalize_extracted_info(extracted_info: dict):
+    location = (extracted_info.get("location") or "").strip().lower()
+    experiences = sorted(
+        " ".join(exp.lower().split()) for exp in extracted_info.get("requested_experiences", [])
+    )
+    return location, tuple(experiences)
+
+
+class ResponseCache:
+    """
+    Opt-in cache of final assistant answers for deterministic informational
+    queries, keyed on intent plus the normalized question text. Only turns on
+    threads without a booking context fill it, and entries never outlive the
+    feed or catalog data they were answered from.
+    """
+
+    def __init__(self, enabled=False, cache=None, max_entries=512):
+        self.enabled = enabled
+        self._cache = cache if cache is not None else TTLCache(default_ttl=FEED_TTL, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, user_input: str, request_plan: dict):
+        """
+        Build a cache key for the request, or return None when it must bypass the cache.
+        Returns (key, ttl).
+        """
+        if not self.enabled:
+            return None
+        classified = classify_informational_intent(user_input, request_plan)
+        if not classified:
+            return None
+        intent, ttl = classified
+        location, _ = normalize_extracted_info(request_plan.get("extracted_info", {}))
+        if location and (location in NON_LOCATIONS or not location.isalpha()):
+            return None
+        # "what dining is ..." extracts "dining" as the location via "at\s+(\w+)"
+        if location and any(pattern.fullmatch(location) for _, pattern, _ in INFORMATIONAL_INTENTS):
+            return None
+        # Dining and experiences only make sense for a specific property
+        if intent != "list_properties" and not location:
+            return None
+        # Everything the guest asked is part of the key: "hotels in Europe near a
+        # beach" and "... with ski access" share an intent and a location
+        return (intent, normalize_question(user_input)), ttl
+
+    def get(self, key):
+        value = self._cache.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    @staticmethod
+    def cacheable_session(session: dict) -> bool:
+        return not any(session.get(key) for key in SESSION_CONTEXT_KEYS)
+
+    def set(self, key, response: str, ttl, source_ttls=()):
+        """
+        Cache a response for at most `ttl` seconds and no longer than the
+        remaining lifetime of any cached data it was built from.
+        """
+        ttl = min([ttl] + [remaining for remaining in source_ttls if remaining is not None])
+        if ttl <= 0:
+            return
+        self._cache.set(key, response, ttl=ttl)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
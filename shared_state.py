@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from cache import TTLCache
+
+
+class StateBackend:
+    """
+    Key/value store for state that must be shared by every worker serving the
+    API: conversation sessions, catalog and feed caches, cached responses and
+    idempotency keys.
+
+    Keys are strings grouped by namespace; values are JSON-serializable.
+    `ttl` is in seconds, None meaning no expiry. A networked implementation
+    (Redis, Memcached, a database) only needs to provide these operations;
+    `add` must be atomic across all workers since it backs idempotency keys.
+    """
+
+    # True if values are kept as live Python objects rather than serialized
+    stores_objects = False
+
+    def get(self, namespace, key, default=None):
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, namespace, key, value, ttl=None):
+        """
+        Store value only if the key is absent or expired. Returns True if stored.
+        """
+        raise NotImplementedError
+
+    def ttl_remaining(self, namespace, key):
+        """
+        Seconds until the key expires (inf if never), or None if it is absent.
+        """
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def clear(self, namespace):
+        raise NotImplementedError
+
+    def count(self, namespace):
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """
+    Per-process backend; state is not shared between workers.
+    """
+
+    stores_objects = True
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _ns(self, namespace):
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = TTLCache(default_ttl=None, max_entries=self.max_entries)
+            return self._namespaces[namespace]
+
+    def get(self, namespace, key, default=None):
+        return self._ns(namespace).get(key, default)
+
+    def set(self, namespace, key, value, ttl=None):
+        self._ns(namespace).set(key, value, ttl=ttl)
+
+    def add(self, namespace, key, value, ttl=None):
+        cache = self._ns(namespace)
+        with self._lock:
+            if cache.get(key) is not None:
+                return False
+            cache.set(key, value, ttl=ttl)
+            return True
+
+    def ttl_remaining(self, namespace, key):
+        return self._ns(namespace).ttl_remaining(key)
+
+    def delete(self, namespace, key):
+        self._ns(namespace).delete(key)
+
+    def clear(self, namespace):
+        self._ns(namespace).clear()
+
+    def count(self, namespace):
+        return len(self._ns(namespace))
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Backend on a local SQLite database in WAL mode, shared by every process
+    on the host (e.g. `uvicorn api:app --workers 4`).
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; each statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expires_at(ttl):
+        return time.time() + ttl if ttl is not None else None
+
+    def get(self, namespace, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value, ttl=None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), self._expires_at(ttl)),
+        )
+        self._maybe_purge()
+
+    def add(self, namespace, key, value, ttl=None):
+        cursor = self._conn().execute(
+            "INSERT INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+            (namespace, key, json.dumps(value), self._expires_at(ttl), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def ttl_remaining(self, namespace, key):
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT expires_at FROM kv WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        return float("inf") if row[0] is None else row[0] - now
+
+    def delete(self, namespace, key):
+        self._conn().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace):
+        self._conn().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def count(self, namespace):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM kv WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        ).fetchone()
+        return row[0]
+
+    def _maybe_purge(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._conn().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+
+class SharedCache:
+    """
+    TTLCache-compatible view over one namespace of a StateBackend.
+    Non-string keys (e.g. ("dining", owsCode)) are JSON-encoded. Values that
+    are not JSON-serializable need an encode/decode pair, which is skipped
+    for backends that keep live objects.
+    """
+
+    def __init__(self, backend, namespace, default_ttl, encode=None, decode=None):
+        self.backend = backend
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.encode = encode if not backend.stores_objects else None
+        self.decode = decode if not backend.stores_objects else None
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, str) else json.dumps(key)
+
+    def get(self, key, default=None):
+        value = self.backend.get(self.namespace, self._key(key))
+        if value is None:
+            return default
+        return self.decode(value) if self.decode else value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if self.encode:
+            value = self.encode(value)
+        self.backend.set(self.namespace, self._key(key), value, ttl=ttl)
+
+    def ttl_remaining(self, key):
+        return self.backend.ttl_remaining(self.namespace, self._key(key))
+
+    def delete(self, key):
+        self.backend.delete(self.namespace, self._key(key))
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+
+def create_backend(kind=None, path=None):
+    """
+    Build the backend selected by STATE_BACKEND ("memory" or "sqlite").
+    """
+    kind = (kind or os.getenv("STATE_BACKEND", "memory")).lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path or os.getenv("STATE_DB_PATH", ".cache/state.db"))
+    raise ValueError(f"Unknown STATE_BACKEND '{kind}'")
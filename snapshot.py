@@ -0,0 +1,58 @@
+import os
+import mmap
+import time
+
+import msgpack
+
+from catalog_records import encode_catalog, decode_catalog, encode_feed, decode_feed
+
+SNAPSHOT_VERSION = 4
+
+
+def write_snapshot(path, catalog, feeds):
+    """
+    Atomically write the catalog (PropertyRecords) and {(category, owsCode): ProductFeed}
+    feeds to a msgpack file.
+    """
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "written_at": time.time(),
+        "catalog": encode_catalog(catalog) if catalog else None,
+        "feeds": [encode_feed(feed) for feed in feeds.values()],
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(msgpack.packb(payload, use_bin_type=True))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+    Load a snapshot written by write_snapshot.
+    Returns {"written_at", "catalog", "feeds"} or None if missing or unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            # Decode straight from the page cache instead of copying the file into memory
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                payload = msgpack.unpackb(mm, raw=False, strict_map_key=False)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, msgpack.UnpackException) as e:
+        print(f"⚠️ Ignoring unreadable snapshot at {path}: {e}")
+        return None
+
+    if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+        print(f"⚠️ Ignoring snapshot at {path} with unsupported version")
+        return None
+
+    return {
+        "written_at": payload.get("written_at"),
+        "catalog": decode_catalog(payload["catalog"]) if payload.get("catalog") else None,
+        "feeds": {(feed.category, feed.owsCode): feed for feed in map(decode_feed, payload.get("feeds", []))},
+    }
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+
+import main
+from snapshot import load_snapshot, write_snapshot
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", ".cache/catalog_snapshot.msgpack")
+SNAPSHOT_REFRESH_SECONDS = int(os.getenv("SNAPSHOT_REFRESH_SECONDS", 30 * 60))
+SNAPSHOT_HOT_PROPERTIES = int(os.getenv("SNAPSHOT_HOT_PROPERTIES", 20))
+FEED_CATEGORIES = ("dining", "experiences")
+
+
+class WarmupService:
+    """
+    Seeds the catalog and feed caches from the on-disk snapshot at startup,
+    then refreshes them from upstream in the background and rewrites the
+    snapshot periodically. With several workers, only the one holding the
+    refresh lease in the shared-state backend refreshes in a given interval.
+    """
+
+    LEASE_NAMESPACE = "warmup"
+    LEASE_KEY = "refresh"
+
+    def __init__(self, path=SNAPSHOT_PATH, interval=SNAPSHOT_REFRESH_SECONDS, hot_properties=SNAPSHOT_HOT_PROPERTIES):
+        self.path = path
+        self.interval = interval
+        self.hot_properties = hot_properties
+        self._stop = threading.Event()
+        self._thread = None
+        # Properties carried over from the snapshot stay hot until real traffic ranks them
+        self._snapshot_properties = []
+        self.loaded_at = None
+        self.last_refresh = None
+        self.skipped_refreshes = 0
+        self.last_error = None
+
+    def start(self):
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        # Only a worker that has been refreshing writes the snapshot
+        if self.last_refresh:
+            self.save()
+
+    def load(self):
+        start = time.perf_counter()
+        snapshot = load_snapshot(self.path)
+        if not snapshot:
+            print(f"ℹ️ No snapshot at {self.path}; starting cold")
+            return
+        if snapshot["catalog"]:
+            main.last_known_catalog = snapshot["catalog"]
+            main.catalog_cache.set("properties", snapshot["catalog"])
+        for key, data in snapshot["feeds"].items():
+            main.last_known_feeds[key] = data
+            main.feed_cache.set(key, data)
+        self._snapshot_properties = list(dict.fromkeys(owsCode for _, owsCode in snapshot["feeds"]))
+        self.loaded_at = time.time()
+        print(
+            f"✅ Loaded snapshot ({len(snapshot['catalog'] or [])} properties, "
+            f"{len(snapshot['feeds'])} feeds) in {1000 * (time.perf_counter() - start):.1f} ms"
+        )
+
+    def hot_owsCodes(self):
+        hot = [owsCode for owsCode, _ in main.feed_hits.most_common(self.hot_properties)]
+        for owsCode in self._snapshot_properties:
+            if len(hot) >= self.hot_properties:
+                break
+            if owsCode not in hot:
+                hot.append(owsCode)
+        return hot
+
+    def refresh(self):
+        """
+        Re-fetch the catalog and hot properties' feeds, then rewrite the snapshot.
+        """
+        try:
+            main.fetch_all_properties(refresh=True)
+        except Exception as e:
+            self.last_error = f"catalog: {e}"
+            print(f"⚠️ Catalog refresh failed: {e}")
+        for owsCode in self.hot_owsCodes():
+            for category in FEED_CATEGORIES:
+                if self._stop.is_set():
+                    return
+                try:
+                    main.get_property_feed(owsCode, category, refresh=True)
+                except Exception as e:
+                    self.last_error = f"{category}/{owsCode}: {e}"
+                    print(f"⚠️ Feed refresh failed for {category}/{owsCode}: {e}")
+        self.last_refresh = time.time()
+        self.save()
+
+    def save(self):
+        hot = set(self.hot_owsCodes())
+        feeds = {key: data for key, data in main.last_known_feeds.items() if key[1] in hot}
+        if not main.last_known_catalog and not feeds:
+            return
+        try:
+            write_snapshot(self.path, main.last_known_catalog, feeds)
+        except Exception as e:
+            self.last_error = f"snapshot write: {e}"
+            print(f"⚠️ Failed to write snapshot to {self.path}: {e}")
+
+    def _claim_refresh(self):
+        try:
+            return main.state_backend.add(self.LEASE_NAMESPACE, self.LEASE_KEY, os.getpid(), ttl=self.interval)
+        except Exception as e:
+            print(f"⚠️ Warmup lease unavailable, refreshing anyway: {e}")
+            return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._claim_refresh():
+                self.refresh()
+            else:
+                # Another worker refreshed within this interval
+                self.skipped_refreshes += 1
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        return {
+            "snapshot_path": self.path,
+            "loaded_at": self.loaded_at,
+            "last_refresh": self.last_refresh,
+            "skipped_refreshes": self.skipped_refreshes,
+            "last_error": self.last_error,
+            "hot_properties": self.hot_owsCodes(),
+        }